@@ -0,0 +1,177 @@
+"""
+Utilidades de la API JSON (/api/v1).
+
+Las rutas están en app.py, junto a las vistas HTML, y usan los mismos
+normalizadores de models.py y el mismo permiso_requerido. Aquí están las
+piezas que no dependen de Flask:
+
+    ?fields=a,b     proyección enviada tal cual a MongoDB (solo viajan esos campos)
+    ?despues=...    paginación keyset de paginacion.py (mismos cursores que el HTML)
+    /lote?ids=...   varios documentos por _id en una consulta $in
+    POST /lote      varios documentos nuevos en un solo bulk_write
+"""
+
+import os
+from datetime import datetime
+from bson import ObjectId
+from models import (
+    to_object_id, normalize_artista, normalize_cliente,
+    normalize_inventario, normalize_venta
+)
+from registro_ventas import validar_cantidad
+
+VERSION = "v1"
+LOTE_MAXIMO = int(os.getenv("API_LOTE_MAXIMO", "500"))
+
+
+class ErrorAPI(Exception):
+    """Error de la API con su código HTTP (se responde como JSON)"""
+
+    def __init__(self, mensaje, estado=400, detalle=None):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.detalle = detalle
+
+
+# Colección -> campos guardados, orden de la paginación y campos obligatorios.
+# "nombre_artista" / "nombre_cliente" son copias guardadas (ver denormalizacion.py):
+# se pueden pedir en ?fields= pero al escribir se ignoran y se toman del artista/cliente.
+RECURSOS = {
+    "artistas": {
+        "campos": ["nombre", "pais", "genero", "activo"],
+        "orden": ("nombre", 1),
+        "obligatorios": ["nombre"],
+        "normalizar": normalize_artista,
+    },
+    "clientes": {
+        "campos": ["nombre", "correo", "telefono"],
+        "orden": ("nombre", 1),
+        "obligatorios": ["nombre", "correo"],
+        "normalizar": normalize_cliente,
+    },
+    "inventario": {
+        "campos": ["artista_id", "nombre_artista", "album", "año", "genero", "stock", "precio_unitario"],
+        "orden": ("album", 1),
+        "obligatorios": ["artista_id", "album"],
+        "normalizar": normalize_inventario,
+    },
+    "ventas": {
+        "campos": ["cliente_id", "nombre_cliente", "artista_id", "nombre_artista", "album",
+                   "fecha_venta", "cantidad", "precio_unitario"],
+        "orden": ("fecha_venta", -1),
+        "obligatorios": ["cliente_id", "artista_id"],
+        "normalizar": normalize_venta,
+    },
+}
+
+def recurso(coleccion):
+    if coleccion not in RECURSOS:
+        raise ErrorAPI(f"Recurso desconocido: {coleccion}", 404)
+    return RECURSOS[coleccion]
+
+
+def campos_pedidos(coleccion, fields):
+    """
+    Campos de ?fields= validados contra el recurso.
+
+    Returns:
+        list: campos pedidos (sin _id), o None si no se pidió proyección
+    """
+    if not fields:
+        return None
+    disponibles = set(recurso(coleccion)["campos"])
+    pedidos = [c.strip() for c in fields.split(",") if c.strip() and c.strip() != "_id"]
+    desconocidos = [c for c in pedidos if c not in disponibles]
+    if desconocidos:
+        raise ErrorAPI(f"Campos desconocidos: {', '.join(desconocidos)}",
+                       detalle={"disponibles": sorted(disponibles)})
+    return pedidos
+
+
+def proyeccion(coleccion, pedidos, extra=()):
+    """
+    Proyección de MongoDB para los campos pedidos (None = documento completo).
+
+    Incluye los campos de `extra` (p. ej. el campo de ordenamiento que
+    necesita el cursor).
+    """
+    if pedidos is None:
+        return None
+    return {c: 1 for c in sorted(set(pedidos) | set(extra))}
+
+
+def recortar(doc, pedidos):
+    """Deja solo _id y los campos pedidos"""
+    if pedidos is None:
+        return doc
+    return {c: doc[c] for c in ["_id", *pedidos] if c in doc}
+
+
+def a_json(valor):
+    """Convierte tipos BSON a valores JSON (ObjectId -> str, fechas ISO 8601)"""
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, dict):
+        return {k: a_json(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [a_json(v) for v in valor]
+    return valor
+
+
+def ids_lote(texto):
+    """Lista de ObjectId de ?ids=a,b,c (en orden y sin repetir)"""
+    crudos = [i.strip() for i in (texto or "").split(",") if i.strip()]
+    if not crudos:
+        raise ErrorAPI("Falta el parámetro ids")
+    if len(crudos) > LOTE_MAXIMO:
+        raise ErrorAPI(f"Máximo {LOTE_MAXIMO} ids por lote")
+    invalidos = [i for i in crudos if to_object_id(i) is None]
+    if invalidos:
+        raise ErrorAPI("Ids inválidos", detalle={"ids": invalidos})
+    return list(dict.fromkeys(to_object_id(i) for i in crudos))
+
+
+def documentos_lote(cuerpo):
+    """Documentos de un POST de lote: una lista o {"documentos": [...]}"""
+    docs = cuerpo.get("documentos") if isinstance(cuerpo, dict) else cuerpo
+    if not isinstance(docs, list) or not docs:
+        raise ErrorAPI('Se espera una lista de documentos o {"documentos": [...]}')
+    if len(docs) > LOTE_MAXIMO:
+        raise ErrorAPI(f"Máximo {LOTE_MAXIMO} documentos por lote")
+    return docs
+
+
+def normalizar_lote(coleccion, docs):
+    """
+    Normaliza cada documento con el normalizador de models.py.
+
+    Los documentos sin _id reciben uno nuevo para poder devolver los ids
+    creados. Si alguno no es válido no se escribe ninguno.
+
+    Raises:
+        ErrorAPI: con la lista de errores por posición
+    """
+    definicion = recurso(coleccion)
+    normalizados, errores = [], []
+    for indice, fila in enumerate(docs):
+        try:
+            if not isinstance(fila, dict):
+                raise ValueError("El documento debe ser un objeto")
+            doc = definicion["normalizar"](fila, custom_id=fila.get("_id"))
+            if "_id" in fila and doc.get("_id") is None:
+                raise ValueError("_id inválido")
+            faltan = [c for c in definicion["obligatorios"] if not doc.get(c)]
+            if faltan:
+                raise ValueError(f"Campos obligatorios: {', '.join(faltan)}")
+            if coleccion == "ventas":
+                validar_cantidad(doc)
+                doc["fecha_venta"] = datetime.fromisoformat(doc["fecha_venta"].replace("Z", ""))
+            doc.setdefault("_id", ObjectId())
+            normalizados.append(doc)
+        except (AttributeError, TypeError, ValueError) as e:
+            errores.append({"indice": indice, "error": str(e)})
+    if errores:
+        raise ErrorAPI("Documentos inválidos", detalle={"errores": errores})
+    return normalizados
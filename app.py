@@ -1,28 +1,57 @@
+import io
 import os
 import re
-from datetime import datetime
+import threading
+from datetime import date, datetime, timedelta
 from functools import wraps
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from pymongo import MongoClient
+from flask import (
+    Flask, Response, render_template, request, redirect, url_for, flash, session,
+    stream_with_context, abort, send_file, jsonify, current_app, make_response
+)
+from werkzeug.local import LocalProxy
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
 from models import (
     normalize_artista, normalize_cliente,
-    normalize_inventario, normalize_venta, to_object_id,
-    validar_usuario, obtener_rol, tiene_permiso
+    normalize_inventario, normalize_venta, to_object_id
+)
+from conexion import base_datos, base_reportes, crear_cliente
+from condicional import calcular_etag, fecha_http, marca_instantanea, marcas_colecciones
+from paginacion import paginar
+from exportar import COLUMNAS, FORMATOS, LOTE, generar_exportacion
+from pdf_reportes import TITULOS as REPORTES_PDF, obtener_pdf
+from paquete_reportes import archivo_paquete, ejecutar_paquete, recurso as recurso_paquete
+from indices import crear_indices
+from cache import CacheLRU, CacheNombres
+from resumenes import RESUMEN_ARTISTAS, RESUMEN_CLIENTES
+from registro_ventas import (
+    CantidadInvalida, StockInsuficiente, eliminar_venta, modificar_venta,
+    registrar_venta, registrar_ventas, validar_cantidad
+)
+from importar import IMPORTADORES, importar, leer_filas
+from api import (
+    VERSION as API_VERSION, ErrorAPI, a_json, campos_pedidos, documentos_lote,
+    ids_lote, normalizar_lote, proyeccion, recortar, recurso
+)
+from instantaneas import Programador, leer_instantanea
+from denormalizacion import completar_nombres, programar_propagacion, programar_relleno
+from usuarios import (
+    LIMITE_INTENTOS_IP, LimitadorVentana, LoginOcupado, autenticar, permisos_rol, sembrar
+)
+from invalidacion import Vigilante
+from compresion import instalar as instalar_compresion
+from estaticos import instalar as instalar_estaticos
+from instrumentacion import MedidorComandos, instalar as instalar_medicion
+from metricas import INTENTOS_LOGIN, MedidorPool, instalar as instalar_metricas
+from reportes import (
+    pipeline_inventario_detalle, pipeline_ventas_detalle,
+    pipeline_estadisticas, pipeline_ventas_por_artista, pipeline_inventario_bajo,
+    pipeline_clientes_activos, pipeline_generos_populares,
+    pipeline_ventas_por_artista_periodo, pipeline_clientes_activos_periodo,
+    pipeline_ventas_por_periodo, rango_fechas, UNIDADES_PERIODO
 )
-
-load_dotenv()
-
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY", "dev_secret")
-# Seguridad: Configuraciones de sesión
-app.config['SESSION_COOKIE_SECURE'] = False  # True en producción con HTTPS
-app.config['SESSION_COOKIE_HTTPONLY'] = True  # Evita acceso desde JavaScript
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # Protección contra CSRF
-
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client[os.getenv("DB_NAME", "tienda_musica")]
 
 # Funciones de Seguridad
 def sanitize_input(value):
@@ -39,11 +68,118 @@ def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
-# Colecciones
-Artistas = db["artistas"]
-Clientes = db["clientes"]
-Inventario = db["inventario"]
-Ventas = db["ventas"]
+# ========== ESTADO POR APLICACIÓN ==========
+
+class Tienda:
+    """
+    Conexión, colecciones y cachés de una instancia de la aplicación.
+
+    Crear la aplicación no conecta nada: el cliente, los índices y los hilos
+    en segundo plano se preparan en el primer request (ya dentro del worker).
+    """
+
+    def __init__(self, config, client=None):
+        self.config = config
+        self.client = client
+        self._lista = False
+        self._lock = threading.Lock()
+
+    def preparar(self):
+        if not self._lista:
+            with self._lock:
+                if not self._lista:
+                    self._conectar()
+                    self._lista = True
+        return self
+
+    def _conectar(self):
+        if self.client is None:
+            # Pool, timeouts y compresión desde el entorno (ver conexion.py)
+            self.client = crear_cliente(
+                self.config["MONGO_URI"], event_listeners=[MedidorComandos(), MedidorPool()]
+            )
+        self.db = base_datos(self.client, self.config["DB_NAME"])
+        # Los reportes leen de secundarios si los hay; el CRUD sigue en el primario
+        self.db_reportes = base_reportes(self.client, self.config["DB_NAME"])
+
+        self.artistas = self.db["artistas"]
+        self.clientes = self.db["clientes"]
+        self.inventario = self.db["inventario"]
+        self.ventas = self.db["ventas"]
+
+        # Resolución id -> nombre para documentos aún sin la copia del nombre
+        self.nombres_artistas = CacheNombres(self.artistas)
+        self.nombres_clientes = CacheNombres(self.clientes)
+        # Tablero de estadísticas, por base de datos y con TTL corto
+        self.cache_estadisticas = CacheLRU(
+            maximo=16, ttl=self.config["ESTADISTICAS_TTL"], nombre="estadisticas"
+        )
+        # Intentos de login por IP y por usuario
+        self.limitador_login = LimitadorVentana()
+
+        # Invalidación entre workers: change streams, o sondeo de versiones sin replica set
+        self.vigilante = Vigilante(self.db)
+        self.vigilante.suscribir("artistas", self.nombres_artistas.invalidar)
+        self.vigilante.suscribir("clientes", self.nombres_clientes.invalidar)
+        for coleccion in self.vigilante.colecciones:
+            self.vigilante.suscribir(coleccion, lambda _id: self.cache_estadisticas.invalidar())
+
+        # Índices del manifiesto (idempotente)
+        try:
+            crear_indices(self.db)
+        except Exception as e:
+            current_app.logger.warning(f"No se pudieron crear los índices: {e}")
+
+        # Nombres copiados en inventario y ventas anteriores a la denormalización
+        try:
+            programar_relleno(self.db)
+        except Exception as e:
+            current_app.logger.warning(f"No se pudo programar el relleno de nombres: {e}")
+
+        # Roles y, sin usuarios todavía, los de demostración (ver usuarios.py)
+        try:
+            sembrar(self.db, demo=self.config["USUARIOS_DEMO"])
+        except Exception as e:
+            current_app.logger.warning(f"No se pudieron crear los usuarios iniciales: {e}")
+
+        # Refresco periódico de las instantáneas de reportes (un líder entre workers)
+        self.programador = None
+        if self.config["REPORTES_PROGRAMADOR"]:
+            self.programador = Programador(self.db_reportes)
+            self.programador.iniciar()
+        if self.config["INVALIDACION_VIGILANTE"]:
+            self.vigilante.iniciar()
+
+def tienda():
+    """Estado de la aplicación en curso, preparado en el primer uso"""
+    return current_app.extensions["tienda"].preparar()
+
+# Nombres usados por las vistas; cada uno apunta al estado de la app en curso
+client = LocalProxy(lambda: tienda().client)
+db = LocalProxy(lambda: tienda().db)
+db_reportes = LocalProxy(lambda: tienda().db_reportes)
+Artistas = LocalProxy(lambda: tienda().artistas)
+Clientes = LocalProxy(lambda: tienda().clientes)
+Inventario = LocalProxy(lambda: tienda().inventario)
+Ventas = LocalProxy(lambda: tienda().ventas)
+nombres_artistas = LocalProxy(lambda: tienda().nombres_artistas)
+nombres_clientes = LocalProxy(lambda: tienda().nombres_clientes)
+limitador_login = LocalProxy(lambda: tienda().limitador_login)
+cache_estadisticas = LocalProxy(lambda: tienda().cache_estadisticas)
+vigilante = LocalProxy(lambda: tienda().vigilante)
+
+def preparar_tienda():
+    """Conecta y arranca los hilos en el primer request del proceso"""
+    tienda()
+
+# Vistas registradas por create_app en cada aplicación (mismos endpoints que @app.route)
+_RUTAS = []
+
+def ruta(regla, **opciones):
+    def decorador(f):
+        _RUTAS.append((regla, f, opciones))
+        return f
+    return decorador
 
 # ========== AUTENTICACIÓN ==========
 
@@ -63,18 +199,83 @@ def permiso_requerido(permiso):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if "usuario" not in session:
+                if request.path.startswith("/api/"):
+                    raise ErrorAPI("Debes iniciar sesión", 401)
                 flash("Debes iniciar sesión", "error")
                 return redirect(url_for("login"))
             
-            usuario = session.get("usuario")
-            if not tiene_permiso(usuario, permiso):
+            # Permisos del rol guardados en la sesión al iniciarla
+            permisos = session.get("permisos")
+            if permisos is None:
+                # Sesión iniciada antes de guardar los permisos
+                permisos = session["permisos"] = permisos_rol(db, session.get("rol"))
+            if permiso not in permisos:
+                if request.path.startswith("/api/"):
+                    raise ErrorAPI(f"No tienes permiso para {permiso}", 403)
                 flash(f"No tienes permiso para {permiso}", "error")
                 return redirect(url_for("index"))
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
-@app.route("/login", methods=["GET", "POST"])
+def _cabeceras_condicionales(response, etag, modificado):
+    response.set_etag(etag)
+    if modificado is not None:
+        response.last_modified = modificado
+    # El navegador revalida siempre; la página depende del usuario (cookie)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
+
+def condicional(*colecciones, instantanea=False):
+    """
+    Decorador de GET condicional: responde 304 sin ejecutar la vista si las
+    colecciones que lee (y su instantánea, si es un reporte) no cambiaron.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Con mensajes flash pendientes o ?fresh=1 la página se genera siempre
+            if "_flashes" in session or request.args.get("fresh") == "1":
+                return f(*args, **kwargs)
+
+            versiones, modificado = marcas_colecciones(db, colecciones)
+            generado = dia = None
+            if instantanea:
+                dia = date.today().isoformat()  # "últimos 12 meses" cambia cada día
+                if not filtros_reporte(request.args):
+                    generado = marca_instantanea(db, request.endpoint)
+                    if generado and (modificado is None or generado > modificado):
+                        modificado = generado
+            etag = calcular_etag(
+                request.endpoint, kwargs, sorted(request.args.items(multi=True)),
+                session.get("usuario"), session.get("rol"), versiones, generado, dia,
+            )
+            modificado = fecha_http(modificado)
+
+            if request.if_none_match:
+                # Comparación débil: la compresión marca el ETag como W/"..."
+                sin_cambios = request.if_none_match.contains_weak(etag)
+            else:
+                sin_cambios = bool(modificado and request.if_modified_since
+                                   and modificado <= request.if_modified_since)
+            if sin_cambios:
+                return _cabeceras_condicionales(current_app.response_class(status=304), etag, modificado)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                _cabeceras_condicionales(response, etag, modificado)
+            return response
+        return decorated_function
+    return decorator
+
+def _login_rechazado(mensaje, estado, espera):
+    flash(mensaje, "error")
+    response = make_response(render_template("login.html"), estado)
+    response.headers["Retry-After"] = str(espera)
+    return response
+
+@ruta("/login", methods=["GET", "POST"])
 def login():
     """Ruta de login con validación segura"""
     if request.method == "POST":
@@ -83,43 +284,62 @@ def login():
         
         # Validación de entrada
         if not usuario or not password:
+            INTENTOS_LOGIN.labels("invalido").inc()
             flash("Usuario y contraseña son requeridos", "error")
             return render_template("login.html")
         
         if len(usuario) < 3 or len(usuario) > 50:
+            INTENTOS_LOGIN.labels("invalido").inc()
             flash("Usuario debe tener entre 3 y 50 caracteres", "error")
             return render_template("login.html")
         
         if len(password) < 6 or len(password) > 100:
+            INTENTOS_LOGIN.labels("invalido").inc()
             flash("Contraseña debe tener entre 6 y 100 caracteres", "error")
             return render_template("login.html")
         
         # Validar que el usuario solo contenga caracteres permitidos
         if not re.match(r'^[a-zA-Z0-9_-]+$', usuario):
+            INTENTOS_LOGIN.labels("invalido").inc()
             flash("Usuario solo puede contener letras, números, guiones y guiones bajos", "error")
             return render_template("login.html")
         
-        # Validar credenciales
-        resultado = validar_usuario(usuario, password)
+        # El intento se cuenta antes de verificar: los rechazados no llegan al pool de hash
+        for clave, limite in ((f"ip:{request.remote_addr}", LIMITE_INTENTOS_IP), (f"usuario:{usuario}", None)):
+            permitido, espera = limitador_login.registrar(clave, limite)
+            if not permitido:
+                INTENTOS_LOGIN.labels("bloqueado").inc()
+                return _login_rechazado(f"Demasiados intentos, espera {espera} segundos", 429, espera)
+
+        # Validar credenciales (hash verificado en el pool de login)
+        try:
+            resultado = autenticar(db, usuario, password)
+        except LoginOcupado as e:
+            INTENTOS_LOGIN.labels("ocupado").inc()
+            return _login_rechazado(str(e), 503, 1)
         if resultado:
+            INTENTOS_LOGIN.labels("exito").inc()
+            limitador_login.limpiar(f"usuario:{usuario}")
             session["usuario"] = usuario
-            session["nombre"] = resultado.get("nombre", usuario)
-            session["rol"] = resultado.get("rol", "")
+            session["nombre"] = resultado["nombre"]
+            session["rol"] = resultado["rol"]
+            session["permisos"] = resultado["permisos"]
             flash(f"✅ Bienvenido {resultado.get('nombre', usuario)}", "success")
             return redirect(url_for("index"))
         else:
+            INTENTOS_LOGIN.labels("fallo").inc()
             flash("❌ Usuario o contraseña incorrectos", "error")
     
     return render_template("login.html")
 
-@app.route("/logout")
+@ruta("/logout")
 def logout():
     """Ruta de logout"""
     session.clear()
     flash("Has cerrado sesión", "info")
     return redirect(url_for("login"))
 
-@app.route("/")
+@ruta("/")
 def index():
     if "usuario" not in session:
         return redirect(url_for("login"))
@@ -127,13 +347,14 @@ def index():
 
 
 # ---------- ARTISTAS ----------
-@app.route("/artistas")
+@ruta("/artistas")
 @permiso_requerido("find")
+@condicional("artistas")
 def artistas_list():
-    artistas = list(Artistas.find().sort("nombre", 1))
-    return render_template("artistas/list.html", artistas=artistas)
+    pagina = paginar(Artistas, "nombre", 1, args=request.args)
+    return render_template("artistas/list.html", artistas=pagina["items"], pagina=pagina)
 
-@app.route("/artistas/nuevo", methods=["GET", "POST"])
+@ruta("/artistas/nuevo", methods=["GET", "POST"])
 @permiso_requerido("insert")
 def artistas_new():
     if request.method == "POST":
@@ -146,6 +367,7 @@ def artistas_new():
         try:
             Artistas.insert_one(doc)
             id_creado = doc.get("_id", "")
+            vigilante.publicar("artistas", id_creado)
             flash(f"Artista creado con ID: {id_creado}", "success")
             return redirect(url_for("artistas_list"))
         except Exception as e:
@@ -154,38 +376,47 @@ def artistas_new():
     
     return render_template("artistas/form.html", item=None)
 
-@app.route("/artistas/<id>")
+@ruta("/artistas/<id>")
 @permiso_requerido("find")
+@condicional("artistas")
 def artistas_view(id):
     item = Artistas.find_one({"_id": ObjectId(id)})
     return render_template("artistas/view.html", item=item)
 
-@app.route("/artistas/<id>/editar", methods=["GET", "POST"])
+@ruta("/artistas/<id>/editar", methods=["GET", "POST"])
 @permiso_requerido("update")
 def artistas_edit(id):
     item = Artistas.find_one({"_id": ObjectId(id)})
     if request.method == "POST":
         doc = normalize_artista(request.form)
-        Artistas.update_one({"_id": ObjectId(id)}, {"$set": doc})
+        anterior = Artistas.find_one_and_update(
+            {"_id": ObjectId(id)}, {"$set": doc}, return_document=ReturnDocument.BEFORE
+        )
+        if anterior and anterior.get("nombre") != doc["nombre"]:
+            # Inventario, ventas y resúmenes guardan una copia del nombre
+            programar_propagacion(db._get_current_object(), "artistas", anterior["_id"], doc["nombre"])
+        vigilante.publicar("artistas", id)
         flash("Artista actualizado", "success")
         return redirect(url_for("artistas_list"))
     return render_template("artistas/form.html", item=item)
 
-@app.route("/artistas/<id>/eliminar", methods=["POST"])
+@ruta("/artistas/<id>/eliminar", methods=["POST"])
 @permiso_requerido("remove")
 def artistas_delete(id):
     Artistas.delete_one({"_id": ObjectId(id)})
+    vigilante.publicar("artistas", id)
     flash("Artista eliminado", "success")
     return redirect(url_for("artistas_list"))
 
 # ---------- CLIENTES ----------
-@app.route("/clientes")
+@ruta("/clientes")
 @permiso_requerido("find")
+@condicional("clientes")
 def clientes_list():
-    clientes = list(Clientes.find().sort("nombre", 1))
-    return render_template("clientes/list.html", clientes=clientes)
+    pagina = paginar(Clientes, "nombre", 1, args=request.args)
+    return render_template("clientes/list.html", clientes=pagina["items"], pagina=pagina)
 
-@app.route("/clientes/nuevo", methods=["GET", "POST"])
+@ruta("/clientes/nuevo", methods=["GET", "POST"])
 @permiso_requerido("insert")
 def clientes_new():
     if request.method == "POST":
@@ -198,6 +429,7 @@ def clientes_new():
         try:
             Clientes.insert_one(doc)
             id_creado = doc.get("_id", "")
+            vigilante.publicar("clientes", id_creado)
             flash(f"Cliente creado con ID: {id_creado}", "success")
             return redirect(url_for("clientes_list"))
         except Exception as e:
@@ -206,39 +438,47 @@ def clientes_new():
     
     return render_template("clientes/form.html", item=None)
 
-@app.route("/clientes/<id>")
+@ruta("/clientes/<id>")
 @permiso_requerido("find")
+@condicional("clientes")
 def clientes_view(id):
     item = Clientes.find_one({"_id": ObjectId(id)})
     return render_template("clientes/view.html", item=item)
 
-@app.route("/clientes/<id>/editar", methods=["GET", "POST"])
+@ruta("/clientes/<id>/editar", methods=["GET", "POST"])
 @permiso_requerido("update")
 def clientes_edit(id):
     item = Clientes.find_one({"_id": ObjectId(id)})
     if request.method == "POST":
         doc = normalize_cliente(request.form)
-        Clientes.update_one({"_id": ObjectId(id)}, {"$set": doc})
+        anterior = Clientes.find_one_and_update(
+            {"_id": ObjectId(id)}, {"$set": doc}, return_document=ReturnDocument.BEFORE
+        )
+        if anterior and anterior.get("nombre") != doc["nombre"]:
+            programar_propagacion(db._get_current_object(), "clientes", anterior["_id"], doc["nombre"])
+        vigilante.publicar("clientes", id)
         flash("Cliente actualizado", "success")
         return redirect(url_for("clientes_list"))
     return render_template("clientes/form.html", item=item)
 
-@app.route("/clientes/<id>/eliminar", methods=["POST"])
+@ruta("/clientes/<id>/eliminar", methods=["POST"])
 @permiso_requerido("remove")
 def clientes_delete(id):
     Clientes.delete_one({"_id": ObjectId(id)})
+    vigilante.publicar("clientes", id)
     flash("Cliente eliminado", "success")
     return redirect(url_for("clientes_list"))
 
 # ---------- INVENTARIO ----------
-@app.route("/inventario")
+@ruta("/inventario")
 @permiso_requerido("find")
+@condicional("inventario", "artistas")
 def inventario_list():
-    items = list(Inventario.find().sort("album", 1))
-    artistas = list(Artistas.find({}, {"_id": 1, "nombre": 1}))
-    return render_template("inventario/list.html", inventario=items, artistas=artistas)
+    pipeline = pipeline_inventario_detalle()
+    pagina = paginar(Inventario, "album", 1, args=request.args, pipeline=pipeline)
+    return render_template("inventario/list.html", inventario=pagina["items"], pagina=pagina)
 
-@app.route("/inventario/nuevo", methods=["GET", "POST"])
+@ruta("/inventario/nuevo", methods=["GET", "POST"])
 @permiso_requerido("insert")
 def inventario_new():
     if request.method == "POST":
@@ -248,12 +488,13 @@ def inventario_new():
             flash("Artista y álbum son obligatorios", "error")
             return redirect(url_for("inventario_new"))
         
-        # No necesitamos guardar nombre_artista, $lookup lo traerá
-        doc.pop("nombre_artista", None)
+        # El nombre del artista se copia desde artistas, no desde el formulario
+        completar_nombres(db, "inventario", [doc])
         
         try:
             Inventario.insert_one(doc)
             id_creado = doc.get("_id", "")
+            vigilante.publicar("inventario", id_creado)
             flash(f"Producto creado con ID: {id_creado}", "success")
             return redirect(url_for("inventario_list"))
         except Exception as e:
@@ -263,80 +504,51 @@ def inventario_new():
     artistas = list(Artistas.find().sort("nombre", 1))
     return render_template("inventario/form.html", item=None, artistas=artistas)
 
-@app.route("/inventario/<id>")
+@ruta("/inventario/<id>")
 @permiso_requerido("find")
+@condicional("inventario", "artistas")
 def inventario_view(id):
     item = Inventario.find_one({"_id": ObjectId(id)})
-    if item:
-        artistas_dict = {str(a["_id"]): a["nombre"] for a in Artistas.find()}
-        item["nombre_artista"] = artistas_dict.get(str(item.get("artista_id")), "N/A")
+    if item and not item.get("nombre_artista"):
+        item["nombre_artista"] = nombres_artistas.nombre(item.get("artista_id"))
     return render_template("inventario/view.html", item=item)
 
-@app.route("/inventario/<id>/editar", methods=["GET", "POST"])
+@ruta("/inventario/<id>/editar", methods=["GET", "POST"])
 @permiso_requerido("update")
 def inventario_edit(id):
     if request.method == "POST":
         doc = normalize_inventario(request.form)
+        completar_nombres(db, "inventario", [doc])
         Inventario.update_one({"_id": ObjectId(id)}, {"$set": doc})
+        vigilante.publicar("inventario", id)
         flash("Inventario actualizado", "success")
         return redirect(url_for("inventario_list"))
 
     item = Inventario.find_one({"_id": ObjectId(id)})
-    if item:
-        artistas_dict = {str(a["_id"]): a["nombre"] for a in Artistas.find()}
-        item["nombre_artista"] = artistas_dict.get(str(item.get("artista_id")), "N/A")
+    if item and not item.get("nombre_artista"):
+        item["nombre_artista"] = nombres_artistas.nombre(item.get("artista_id"))
     artistas = list(Artistas.find().sort("nombre", 1))
     return render_template("inventario/form.html", item=item, artistas=artistas)
 
-@app.route("/inventario/<id>/eliminar", methods=["POST"])
+@ruta("/inventario/<id>/eliminar", methods=["POST"])
 @permiso_requerido("remove")
 def inventario_delete(id):
     Inventario.delete_one({"_id": ObjectId(id)})
+    vigilante.publicar("inventario", id)
     flash("Inventario eliminado", "success")
     return redirect(url_for("inventario_list"))
 
 # ---------- VENTAS ----------
-@app.route("/ventas")
+@ruta("/ventas")
 @permiso_requerido("find")
+@condicional("ventas", "clientes", "artistas")
 def ventas_list():
-    """Lista de ventas optimizada con agregación $lookup"""
-    pipeline = [
-        { "$sort": { "fecha_venta": -1 } },
-        {
-            "$lookup": {
-                "from": "clientes",
-                "localField": "cliente_id",
-                "foreignField": "_id",
-                "as": "cliente_info"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "artistas",
-                "localField": "artista_id",
-                "foreignField": "_id",
-                "as": "artista_info"
-            }
-        },
-        { "$unwind": { "path": "$cliente_info", "preserveNullAndEmptyArrays": True } },
-        { "$unwind": { "path": "$artista_info", "preserveNullAndEmptyArrays": True } },
-        {
-            "$project": {
-                "_id": 1,
-                "fecha_venta": 1,
-                "album": 1,
-                "cantidad": 1,
-                "precio_unitario": 1,
-                "nombre_cliente": { "$ifNull": ["$cliente_info.nombre", "N/A"] },
-                "nombre_artista": { "$ifNull": ["$artista_info.nombre", "N/A"] },
-                "total_venta": { "$multiply": ["$cantidad", "$precio_unitario"] }
-            }
-        }
-    ]
-    ventas = list(Ventas.aggregate(pipeline))
-    return render_template("ventas/list.html", ventas=ventas)
+    """Lista de ventas paginada por (fecha_venta, _id) con los nombres guardados"""
+    pipeline = pipeline_ventas_detalle()
+    pagina = paginar(Ventas, "fecha_venta", -1, args=request.args, pipeline=pipeline)
+    return render_template("ventas/list.html", ventas=pagina["items"], pagina=pagina)
 
-@app.route("/ventas/nuevo", methods=["GET", "POST"])
+@ruta("/ventas/nuevo", methods=["GET", "POST"])
 @permiso_requerido("insert")
 def ventas_new():
     if request.method == "POST":
@@ -349,34 +561,52 @@ def ventas_new():
             flash("Fecha inválida. Usa formato ISO (YYYY-MM-DD).", "error")
             return redirect(url_for("ventas_new"))
         
+        if not doc["cliente_id"] or not doc["artista_id"]:
+            flash("Selecciona un cliente y un artista de la lista", "error")
+            return redirect(url_for("ventas_new"))
 
+        try:
+            validar_cantidad(doc)
+        except CantidadInvalida as e:
+            flash(str(e), "error")
+            return redirect(url_for("ventas_new"))
         
+        completar_nombres(db, "ventas", [doc])
         try:
-            Ventas.insert_one(doc)
+            # Descuenta stock, inserta la venta y actualiza resúmenes en una transacción
+            producto = registrar_venta(client, db, doc)
             id_creado = doc.get("_id", "")
+            vigilante.publicar("ventas", id_creado)
+            vigilante.publicar("inventario", producto["_id"])
             flash(f"Venta registrada con ID: {id_creado}", "success")
             return redirect(url_for("ventas_list"))
+        except StockInsuficiente as e:
+            flash(str(e), "error")
+            return redirect(url_for("ventas_new"))
         except Exception as e:
             flash(f"Error al registrar venta: {str(e)}", "error")
             return redirect(url_for("ventas_new"))
     
-    clientes = list(Clientes.find().sort("nombre", 1))
-    artistas = list(Artistas.find().sort("nombre", 1))
-    inv = list(Inventario.find().sort("album", 1))
-    return render_template("ventas/form.html", item=None, clientes=clientes, artistas=artistas, inventario=inv)
+    # Cliente, artista y álbum se eligen con los endpoints de búsqueda
+    return render_template("ventas/form.html", item=None)
 
-@app.route("/ventas/<id>")
+def completar_nombres_venta(item):
+    """Nombres de cliente y artista de una venta anterior a las copias (denormalizacion.py)"""
+    if not item.get("nombre_cliente"):
+        item["nombre_cliente"] = nombres_clientes.nombre(item.get("cliente_id"))
+    if not item.get("nombre_artista"):
+        item["nombre_artista"] = nombres_artistas.nombre(item.get("artista_id"))
+
+@ruta("/ventas/<id>")
 @permiso_requerido("find")
+@condicional("ventas", "clientes", "artistas")
 def ventas_view(id):
     item = Ventas.find_one({"_id": ObjectId(id)})
     if item:
-        clientes_dict = {str(c["_id"]): c["nombre"] for c in Clientes.find()}
-        artistas_dict = {str(a["_id"]): a["nombre"] for a in Artistas.find()}
-        item["nombre_cliente"] = clientes_dict.get(str(item.get("cliente_id")), "N/A")
-        item["nombre_artista"] = artistas_dict.get(str(item.get("artista_id")), "N/A")
+        completar_nombres_venta(item)
     return render_template("ventas/view.html", item=item)
 
-@app.route("/ventas/<id>/editar", methods=["GET", "POST"])
+@ruta("/ventas/<id>/editar", methods=["GET", "POST"])
 @permiso_requerido("update")
 def ventas_edit(id):
     if request.method == "POST":
@@ -386,279 +616,472 @@ def ventas_edit(id):
         except Exception:
             flash("Fecha inválida", "error")
             return redirect(url_for("ventas_edit", id=id))
-        Ventas.update_one({"_id": ObjectId(id)}, {"$set": doc})
+        if not doc["cliente_id"] or not doc["artista_id"]:
+            flash("Selecciona un cliente y un artista de la lista", "error")
+            return redirect(url_for("ventas_edit", id=id))
+        completar_nombres(db, "ventas", [doc])
+        try:
+            # Devuelve el stock anterior, descuenta el nuevo y corrige resúmenes
+            anterior = modificar_venta(client, db, ObjectId(id), doc)
+        except (CantidadInvalida, StockInsuficiente) as e:
+            flash(str(e), "error")
+            return redirect(url_for("ventas_edit", id=id))
+        except Exception as e:
+            flash(f"Error al actualizar venta: {str(e)}", "error")
+            return redirect(url_for("ventas_edit", id=id))
+        if not anterior:
+            flash("Venta no encontrada", "error")
+            return redirect(url_for("ventas_list"))
+        vigilante.publicar("ventas", id)
+        vigilante.publicar("inventario")
         flash("Venta actualizada", "success")
         return redirect(url_for("ventas_list"))
     
     item = Ventas.find_one({"_id": ObjectId(id)})
     if item:
-        clientes_dict = {str(c["_id"]): c["nombre"] for c in Clientes.find()}
-        artistas_dict = {str(a["_id"]): a["nombre"] for a in Artistas.find()}
-        item["nombre_cliente"] = clientes_dict.get(str(item.get("cliente_id")), "N/A")
-        item["nombre_artista"] = artistas_dict.get(str(item.get("artista_id")), "N/A")
-    clientes = list(Clientes.find().sort("nombre", 1))
-    artistas = list(Artistas.find().sort("nombre", 1))
-    inv = list(Inventario.find().sort("album", 1))
-    return render_template("ventas/form.html", item=item, clientes=clientes, artistas=artistas, inventario=inv)
+        completar_nombres_venta(item)
+    return render_template("ventas/form.html", item=item)
 
-@app.route("/ventas/<id>/eliminar", methods=["POST"])
+@ruta("/ventas/<id>/eliminar", methods=["POST"])
 @permiso_requerido("remove")
 def ventas_delete(id):
-    Ventas.delete_one({"_id": ObjectId(id)})
+    # Devuelve el stock de la venta y la resta de los resúmenes
+    anterior = eliminar_venta(client, db, ObjectId(id))
+    if not anterior:
+        flash("Venta no encontrada", "error")
+        return redirect(url_for("ventas_list"))
+    vigilante.publicar("ventas", id)
+    vigilante.publicar("inventario")
     flash("Venta eliminada", "success")
     return redirect(url_for("ventas_list"))
 
+# ========== BÚSQUEDA ==========
+
+BUSQUEDA_LIMITE = int(os.getenv("BUSQUEDA_LIMITE", "10"))
+
+# Colección -> (campo con índice para el prefijo, proyección devuelta)
+BUSQUEDAS = {
+    "artistas": ("nombre", {"nombre": 1}),
+    "clientes": ("nombre", {"nombre": 1, "correo": 1}),
+    "inventario": ("album", {"album": 1, "artista_id": 1, "precio_unitario": 1, "stock": 1}),
+}
+
+def filtro_prefijo(campo, texto):
+    """Prefijo anclado (^texto) que recorre el índice del campo.
+
+    Se prueba también con la inicial en mayúscula, ya que una regex
+    sin distinción de mayúsculas no puede usar el índice.
+    """
+    variantes = {texto, texto[:1].upper() + texto[1:]}
+    return {campo: {"$in": [re.compile("^" + re.escape(v)) for v in sorted(variantes)]}}
+
+@ruta("/buscar/<coleccion>")
+@permiso_requerido("find")
+def buscar(coleccion):
+    """Primeros N documentos cuyo nombre (o álbum) empieza por ?q="""
+    if coleccion not in BUSQUEDAS:
+        abort(404)
+    campo, proyeccion = BUSQUEDAS[coleccion]
+    texto = request.args.get("q", "").strip()[:50]
+    try:
+        limite = max(1, min(int(request.args.get("limite", BUSQUEDA_LIMITE)), 50))
+    except ValueError:
+        limite = BUSQUEDA_LIMITE
+
+    filtro = filtro_prefijo(campo, texto) if texto else {}
+    if coleccion == "inventario" and request.args.get("artista_id"):
+        filtro["artista_id"] = to_object_id(request.args.get("artista_id"))
+
+    docs = db[coleccion].find(filtro, proyeccion).sort(campo, 1).limit(limite)
+    return jsonify([
+        {k: str(v) if isinstance(v, ObjectId) else v for k, v in d.items()}
+        for d in docs
+    ])
+
 # ========== REPORTES CON AGREGACIONES ==========
 
-@app.route("/reportes")
+@ruta("/reportes")
 @permiso_requerido("find")
 def reportes():
     """Página principal de reportes"""
     return render_template("reportes/index.html")
 
-@app.route("/reportes/estadisticas")
-@permiso_requerido("find")
-def estadisticas():
-    """Estadísticas generales usando $count y $sum"""
-    
-    # 1. $count: Contar total de registros
-    total_artistas = Artistas.count_documents({})
-    total_clientes = Clientes.count_documents({})
-    total_productos = Inventario.count_documents({})
-    total_ventas = Ventas.count_documents({})
-    
-    # 2. $sum con agregación: Ingresos totales por ventas
-    ingresos_totales = list(Ventas.aggregate([
-        {
-            "$group": {
-                "_id": None,
-                "ingresos_totales": { "$sum": { "$multiply": ["$cantidad", "$precio_unitario"] } }
-            }
-        }
-    ]))
-    ingresos = ingresos_totales[0]["ingresos_totales"] if ingresos_totales else 0
-    
-    # 3. Stock total en inventario con $sum
-    stock_total = list(Inventario.aggregate([
-        {
-            "$group": {
-                "_id": None,
-                "stock_total": { "$sum": "$stock" }
-            }
-        }
-    ]))
-    stock = stock_total[0]["stock_total"] if stock_total else 0
-    
+def filtros_reporte(args):
+    """True si la query string pide algo distinto del reporte por defecto"""
+    return bool(args.get("desde") or args.get("hasta") or args.get("unidad", "month") != "month")
+
+def reporte(nombre, args, consulta, **opciones):
+    """
+    Filas de un reporte y la fecha en que se generaron.
+
+    Sin filtros se sirve la última instantánea; con ?fresh=1, con filtros o
+    si aún no hay instantánea se ejecuta en vivo (generado es None).
+    """
+    if args.get("fresh") != "1" and not filtros_reporte(args):
+        instantanea = leer_instantanea(db, nombre)
+        if instantanea is not None:
+            return instantanea["filas"], instantanea["generado"]
+    return consulta(args, **opciones), None
+
+def consulta_estadisticas(args, **opciones):
+    """Totales generales en una sola agregación ($group + $unionWith), con caché"""
+    resultado = None if args.get("fresh") == "1" else cache_estadisticas.obtener(db.name)
+    if resultado is None:
+        resultado = next(db_reportes["ventas"].aggregate(pipeline_estadisticas()), {})
+        cache_estadisticas.guardar(db.name, resultado)
+    return [resultado]
+
+def calcular_estadisticas(args):
+    """Estadísticas generales con valores por defecto, y su fecha de generación"""
+    filas, generado = reporte("estadisticas", args, consulta_estadisticas)
+    resultado = next(iter(filas), {})
     estadisticas_dict = {
-        "total_artistas": total_artistas,
-        "total_clientes": total_clientes,
-        "total_productos": total_productos,
-        "total_ventas": total_ventas,
-        "ingresos_totales": round(ingresos, 2),
-        "stock_total": stock
+        "total_artistas": resultado.get("total_artistas") or 0,
+        "total_clientes": resultado.get("total_clientes") or 0,
+        "total_productos": resultado.get("total_productos") or 0,
+        "total_ventas": resultado.get("total_ventas") or 0,
+        "ingresos_totales": round(resultado.get("ingresos_totales") or 0, 2),
+        "stock_total": resultado.get("stock_total") or 0
     }
-    
-    return render_template("reportes/estadisticas.html", stats=estadisticas_dict)
+    return estadisticas_dict, generado
+
+@ruta("/reportes/estadisticas")
+@permiso_requerido("find")
+@condicional("artistas", "clientes", "inventario", "ventas", instantanea=True)
+def estadisticas():
+    """Estadísticas generales en una sola agregación ($group + $unionWith)"""
+    estadisticas_dict, generado = calcular_estadisticas(request.args)
+    return render_template("reportes/estadisticas.html", stats=estadisticas_dict, generado=generado)
+
+def consulta_ventas_por_artista(args, **opciones):
+    """Resumen materializado, o agregación sobre ventas si hay rango de fechas"""
+    desde, hasta = rango_fechas(args)
+    if desde or hasta:
+        return db_reportes["ventas"].aggregate(pipeline_ventas_por_artista_periodo(desde, hasta), **opciones)
+    return db_reportes[RESUMEN_ARTISTAS].aggregate(pipeline_ventas_por_artista(), **opciones)
 
-@app.route("/reportes/ventas-por-artista")
+@ruta("/reportes/ventas-por-artista")
 @permiso_requerido("find")
+@condicional("ventas", "artistas", instantanea=True)
 def ventas_por_artista():
     """
-    Reporte de ventas por artista usando agregaciones MongoDB
+    Reporte de ventas por artista, opcionalmente entre ?desde= y ?hasta=
     """
-    pipeline = [
-        {
-            "$match": {
-                "cantidad": {"$gt": 0}
-            }
-        },
-        {
-            "$lookup": {
-                "from": "artistas",
-                "localField": "artista_id",
-                "foreignField": "_id",
-                "as": "artista"
-            }
-        },
-        {
-            "$unwind": {
-                "path": "$artista",
-                "preserveNullAndEmptyArrays": True
-            }
-        },
-        {
-            "$group": {
-                "_id": "$artista_id",
-                "artista_nombre": {"$first": "$artista.nombre"},
-                "unidades_vendidas": {"$sum": "$cantidad"},
-                "ingresos": {
-                    "$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}
-                },
-                "transacciones": {"$sum": 1}
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "artista": {"$ifNull": ["$artista_nombre", "Desconocido"]},
-                "unidades": "$unidades_vendidas",
-                "ingresos": {"$round": ["$ingresos", 2]},
-                "transacciones": 1
-            }
-        },
-        {
-            "$sort": {"ingresos": -1}
-        }
-    ]
+    filas, generado = reporte("ventas_por_artista", request.args, consulta_ventas_por_artista)
+    return render_template("reportes/ventas_por_artista.html", ventas=list(filas), generado=generado)
 
-    reporte_list = list(Ventas.aggregate(pipeline))
-    return render_template("reportes/ventas_por_artista.html", ventas=reporte_list)
+def consulta_inventario_bajo(args, **opciones):
+    return db_reportes["inventario"].aggregate(pipeline_inventario_bajo(), **opciones)
 
-@app.route("/reportes/inventario-bajo")
+@ruta("/reportes/inventario-bajo")
 @permiso_requerido("find")
+@condicional("inventario", "artistas", instantanea=True)
 def inventario_bajo():
     """
     Productos con stock bajo usando agregaciones MongoDB
     """
-    pipeline = [
-        {
-            "$match": {
-                "stock": {"$lt": 5}
-            }
-        },
-        {
-            "$lookup": {
-                "from": "artistas",
-                "localField": "artista_id",
-                "foreignField": "_id",
-                "as": "artista"
-            }
-        },
-        {
-            "$unwind": {
-                "path": "$artista",
-                "preserveNullAndEmptyArrays": True
-            }
-        },
-        {
-            "$project": {
-                "_id": 1,
-                "nombre": "$album",
-                "stock": 1,
-                "precio_unitario": 1,
-                "valor_total": {"$multiply": ["$stock", "$precio_unitario"]},
-                "artista_nombre": {"$ifNull": ["$artista.nombre", "N/A"]}
-            }
-        },
-        {
-            "$sort": {"stock": 1}
-        }
-    ]
+    filas, generado = reporte("inventario_bajo", request.args, consulta_inventario_bajo)
+    return render_template("reportes/inventario_bajo.html", productos=list(filas), generado=generado)
 
-    productos = list(Inventario.aggregate(pipeline))
-    return render_template("reportes/inventario_bajo.html", productos=productos)
+def consulta_clientes_activos(args, **opciones):
+    """Resumen materializado, o agregación sobre ventas si hay rango de fechas"""
+    desde, hasta = rango_fechas(args)
+    if desde or hasta:
+        return db_reportes["ventas"].aggregate(pipeline_clientes_activos_periodo(desde, hasta), **opciones)
+    return db_reportes[RESUMEN_CLIENTES].aggregate(pipeline_clientes_activos(), **opciones)
 
-@app.route("/reportes/clientes-activos")
+@ruta("/reportes/clientes-activos")
 @permiso_requerido("find")
+@condicional("ventas", "clientes", instantanea=True)
 def clientes_activos():
     """
-    Clientes más activos usando agregaciones MongoDB
+    Clientes más activos, opcionalmente entre ?desde= y ?hasta=
     """
-    pipeline = [
-        {
-            "$match": {
-                "cantidad": {"$gt": 0}
-            }
-        },
-        {
-            "$lookup": {
-                "from": "clientes",
-                "localField": "cliente_id",
-                "foreignField": "_id",
-                "as": "cliente"
-            }
-        },
-        {
-            "$unwind": {
-                "path": "$cliente",
-                "preserveNullAndEmptyArrays": True
-            }
-        },
-        {
-            "$group": {
-                "_id": "$cliente_id",
-                "cliente_nombre": {"$first": "$cliente.nombre"},
-                "compras": {"$sum": 1},
-                "cantidad_articulos": {"$sum": "$cantidad"},
-                "gasto_total": {
-                    "$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}
-                }
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "cliente_id": "$_id",
-                "cliente_nombre": {"$ifNull": ["$cliente_nombre", "Desconocido"]},
-                "compras": 1,
-                "cantidad_articulos": 1,
-                "gasto_total": {"$round": ["$gasto_total", 2]}
-            }
-        },
-        {
-            "$sort": {"gasto_total": -1}
-        }
-    ]
+    filas, generado = reporte("clientes_activos", request.args, consulta_clientes_activos)
+    return render_template("reportes/clientes_activos.html", clientes=list(filas), generado=generado)
+
+def consulta_ventas_por_periodo(args, **opciones):
+    """Serie de tiempo de ventas; sin rango se usan los últimos 12 meses"""
+    unidad = args.get("unidad", "month")
+    if unidad not in UNIDADES_PERIODO:
+        unidad = "month"
+    desde, hasta = rango_fechas(args)
+    if not desde and not hasta:
+        desde = datetime.now() - timedelta(days=365)
+    return db_reportes["ventas"].aggregate(pipeline_ventas_por_periodo(unidad, desde, hasta), **opciones)
 
-    clientes_reporte = list(Ventas.aggregate(pipeline))
-    return render_template("reportes/clientes_activos.html", clientes=clientes_reporte)
+@ruta("/reportes/ventas-por-periodo")
+@permiso_requerido("find")
+@condicional("ventas", instantanea=True)
+def ventas_por_periodo():
+    """
+    Ventas agrupadas por día, semana o mes ($dateTrunc) en un rango de fechas
+    """
+    filas, generado = reporte("ventas_por_periodo", request.args, consulta_ventas_por_periodo)
+    unidad = request.args.get("unidad", "month")
+    return render_template("reportes/ventas_por_periodo.html", periodos=list(filas), generado=generado,
+                           unidad=unidad if unidad in UNIDADES_PERIODO else "month")
 
-@app.route("/reportes/generos-populares")
+def consulta_generos_populares(args, **opciones):
+    return db_reportes["inventario"].aggregate(pipeline_generos_populares(), **opciones)
+
+@ruta("/reportes/generos-populares")
 @permiso_requerido("find")
+@condicional("inventario", instantanea=True)
 def generos_populares():
     """
     Géneros musicales más vendidos usando agregaciones MongoDB
     """
-    pipeline = [
-        {
-            "$match": {
-                "genero": {"$ne": None, "$ne": ""}
-            }
-        },
-        {
-            "$group": {
-                "_id": "$genero",
-                "cantidad_productos": {"$sum": 1},
-                "stock_disponible": {"$sum": "$stock"},
-                "valor_total": {
-                    "$sum": {"$multiply": ["$stock", "$precio_unitario"]}
-                }
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "genero": "$_id",
-                "cantidad_productos": 1,
-                "stock_disponible": 1,
-                "valor_total": {"$round": ["$valor_total", 2]},
-                "valor_promedio": {
-                    "$round": [
-                        {"$divide": ["$valor_total", "$cantidad_productos"]},
-                        2
-                    ]
-                }
-            }
-        },
+    filas, generado = reporte("generos_populares", request.args, consulta_generos_populares)
+    return render_template("reportes/generos_populares.html", generos=list(filas), generado=generado)
+
+@ruta("/reportes/paquete")
+@permiso_requerido("find")
+def paquete():
+    """Los cinco reportes del índice en una sola página, ejecutados en paralelo"""
+    resultado = ejecutar_paquete(db_reportes._get_current_object(), fresco=request.args.get("fresh") == "1")
+    secciones = [
         {
-            "$sort": {"valor_total": -1}
+            "recurso": recurso_paquete(nombre),
+            "titulo": REPORTES_PDF[recurso_paquete(nombre)],
+            "columnas": COLUMNAS[recurso_paquete(nombre)],
+            **datos,
         }
+        for nombre, datos in resultado["reportes"].items()
     ]
+    return render_template("reportes/paquete.html", secciones=secciones, paquete=resultado)
+
+@ruta("/reportes/paquete.zip")
+@permiso_requerido("find")
+def paquete_zip():
+    """Los cinco reportes como un ZIP con un CSV cada uno"""
+    resultado = ejecutar_paquete(db_reportes._get_current_object(), fresco=request.args.get("fresh") == "1")
+    return Response(
+        archivo_paquete(resultado),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=reportes.zip"}
+    )
+
+# ========== IMPORTACIÓN MASIVA ==========
+
+@ruta("/importar", methods=["GET", "POST"])
+@permiso_requerido("insert")
+def importar_archivo():
+    """Importa un archivo CSV o NDJSON en bloques con bulk_write"""
+    coleccion = request.form.get("coleccion", "artistas")
+    reporte = None
+    if request.method == "POST":
+        archivo = request.files.get("archivo")
+        if coleccion not in IMPORTADORES or not archivo or not archivo.filename:
+            flash("Selecciona una colección y un archivo", "error")
+            return redirect(url_for("importar_archivo"))
+
+        formato = "ndjson" if archivo.filename.endswith((".ndjson", ".jsonl")) else "csv"
+        texto = io.TextIOWrapper(archivo.stream, encoding="utf-8-sig", newline="")
+        try:
+            reporte = importar(db._get_current_object(), coleccion, leer_filas(texto, formato))
+        except Exception as e:
+            flash(f"Error al importar: {str(e)}", "error")
+            return redirect(url_for("importar_archivo"))
+
+        # importar() ya incrementó la versión de la colección para los demás workers
+        vigilante.notificar(coleccion)
+        categoria = "warning" if reporte["errores"] else "success"
+        flash(f"Importación de {coleccion}: {reporte['insertadas']} insertadas, "
+              f"{reporte['actualizadas']} actualizadas, {len(reporte['errores'])} con error", categoria)
+
+    return render_template("importar.html", colecciones=list(IMPORTADORES),
+                           coleccion=coleccion, reporte=reporte)
+
+# ========== EXPORTACIÓN ==========
+
+# Documentos de cada recurso exportable, leídos con cursores en lotes.
+# Cada función recibe la query string (rango de fechas de los reportes);
+# los reportes sin filtros salen de su última instantánea.
+EXPORTACIONES = {
+    "artistas": lambda args: Artistas.find().sort([("nombre", 1), ("_id", 1)]).batch_size(LOTE),
+    "clientes": lambda args: Clientes.find().sort([("nombre", 1), ("_id", 1)]).batch_size(LOTE),
+    "inventario": lambda args: Inventario.aggregate(
+        [{"$sort": {"album": 1, "_id": 1}}] + pipeline_inventario_detalle(), batchSize=LOTE
+    ),
+    "ventas": lambda args: Ventas.aggregate(
+        [{"$sort": {"fecha_venta": -1, "_id": -1}}] + pipeline_ventas_detalle(), batchSize=LOTE
+    ),
+    "estadisticas": lambda args: [calcular_estadisticas(args)[0]],
+    "ventas-por-artista": lambda args: reporte(
+        "ventas_por_artista", args, consulta_ventas_por_artista, batchSize=LOTE)[0],
+    "inventario-bajo": lambda args: reporte(
+        "inventario_bajo", args, consulta_inventario_bajo, batchSize=LOTE)[0],
+    "clientes-activos": lambda args: reporte(
+        "clientes_activos", args, consulta_clientes_activos, batchSize=LOTE)[0],
+    "generos-populares": lambda args: reporte(
+        "generos_populares", args, consulta_generos_populares, batchSize=LOTE)[0],
+    "ventas-por-periodo": lambda args: reporte(
+        "ventas_por_periodo", args, consulta_ventas_por_periodo, batchSize=LOTE)[0],
+}
+
+@ruta("/exportar/<recurso>.<formato>")
+@permiso_requerido("find")
+def exportar(recurso, formato):
+    """Exporta un listado o reporte en CSV o NDJSON sin cargarlo en memoria"""
+    if formato == "pdf" and recurso in REPORTES_PDF:
+        return exportar_pdf(recurso)
+    if recurso not in EXPORTACIONES or formato not in FORMATOS:
+        abort(404)
+    documentos = EXPORTACIONES[recurso](request.args)
+    contenido = generar_exportacion(documentos, COLUMNAS[recurso], formato)
+    return Response(
+        stream_with_context(contenido),
+        mimetype=FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename={recurso}.{formato}"}
+    )
+
+def exportar_pdf(recurso):
+    """PDF del reporte, servido desde disco si sus datos no cambiaron"""
+    filas = list(EXPORTACIONES[recurso](request.args))
+    ruta = obtener_pdf(recurso, COLUMNAS[recurso], filas)
+    return send_file(ruta, mimetype="application/pdf", as_attachment=True,
+                     download_name=f"{recurso}.pdf")
+
+# ========== API JSON ==========
+
+API = f"/api/{API_VERSION}"
+
+def respuesta_error_api(error):
+    cuerpo = {"error": str(error), **(error.detalle or {})}
+    return jsonify(cuerpo), error.estado
+
+@ruta(f"{API}/<coleccion>")
+@permiso_requerido("find")
+def api_listar(coleccion):
+    """Página de documentos por keyset (?fields=, ?tamano=, ?despues= / ?antes=)"""
+    campo, orden = recurso(coleccion)["orden"]
+    pedidos = campos_pedidos(coleccion, request.args.get("fields"))
+    # El campo de ordenamiento siempre viaja: lo necesita el cursor
+    proyectar = proyeccion(coleccion, pedidos, extra=[campo])
+    pagina = paginar(db[coleccion], campo, orden, args=request.args,
+                     pipeline=[{"$project": proyectar}] if proyectar else None)
+    docs = pagina["items"]
+    return jsonify({
+        "items": [a_json(recortar(d, pedidos)) for d in docs],
+        "siguiente": pagina["siguiente"],
+        "anterior": pagina["anterior"],
+        "tamano": pagina["tamano"],
+    })
+
+@ruta(f"{API}/<coleccion>/lote")
+@permiso_requerido("find")
+def api_lote(coleccion):
+    """Varios documentos por _id (?ids=a,b,c) en una sola consulta, en el orden pedido"""
+    recurso(coleccion)
+    ids = ids_lote(request.args.get("ids"))
+    pedidos = campos_pedidos(coleccion, request.args.get("fields"))
+    encontrados = {d["_id"]: d for d in db[coleccion].find(
+        {"_id": {"$in": ids}}, proyeccion(coleccion, pedidos)
+    )}
+    docs = [encontrados[i] for i in ids if i in encontrados]
+    return jsonify({
+        "items": [a_json(recortar(d, pedidos)) for d in docs],
+        "faltantes": [str(i) for i in ids if i not in encontrados],
+    })
+
+@ruta(f"{API}/<coleccion>/lote", methods=["POST"])
+@permiso_requerido("insert")
+def api_crear_lote(coleccion):
+    """
+    Crea varios documentos con un solo bulk_write. Las ventas se registran en
+    una transacción que también descuenta el stock (todo o nada).
+    """
+    docs = normalizar_lote(coleccion, documentos_lote(request.get_json(silent=True)))
+    completar_nombres(db, coleccion, docs)
+    if coleccion == "ventas":
+        try:
+            registrar_ventas(client, db, docs)
+        except StockInsuficiente as e:
+            raise ErrorAPI(str(e), 409)
+        vigilante.publicar("ventas")
+        vigilante.publicar("inventario")
+        return jsonify({"creados": [str(d["_id"]) for d in docs], "errores": []}), 201
+
+    errores = []
+    try:
+        db[coleccion].bulk_write([InsertOne(d) for d in docs], ordered=False)
+    except BulkWriteError as e:
+        errores = [{"indice": f["index"], "error": f.get("errmsg", "Error de escritura")}
+                   for f in e.details.get("writeErrors", [])]
+    fallidos = {e["indice"] for e in errores}
+    creados = [str(d["_id"]) for i, d in enumerate(docs) if i not in fallidos]
+    if creados:
+        vigilante.publicar(coleccion)
+    return jsonify({"creados": creados, "errores": errores}), 207 if errores else 201
+
+@ruta(f"{API}/<coleccion>/<id>")
+@permiso_requerido("find")
+def api_obtener(coleccion, id):
+    """Un documento por _id (?fields=)"""
+    recurso(coleccion)
+    pedidos = campos_pedidos(coleccion, request.args.get("fields"))
+    oid = to_object_id(id)
+    doc = db[coleccion].find_one({"_id": oid}, proyeccion(coleccion, pedidos)) if oid else None
+    if doc is None:
+        raise ErrorAPI("No encontrado", 404)
+    return jsonify(a_json(recortar(doc, pedidos)))
+
+# ========== APLICACIÓN ==========
+
+def create_app(config=None, client=None):
+    """
+    Crea una instancia de la aplicación.
+
+    Args:
+        config: dict que se aplica sobre la configuración tomada del entorno
+            (DB_NAME, MONGO_URI, REPORTES_PROGRAMADOR, ...)
+        client: MongoClient (o mongomock) a usar en lugar de uno creado
+            desde el entorno en el primer request
+
+    Returns:
+        Flask: la aplicación, sin conectar todavía a MongoDB
+    """
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=os.getenv("SECRET_KEY", "dev_secret"),
+        # Seguridad: Configuraciones de sesión
+        SESSION_COOKIE_SECURE=False,  # True en producción con HTTPS
+        SESSION_COOKIE_HTTPONLY=True,  # Evita acceso desde JavaScript
+        SESSION_COOKIE_SAMESITE="Lax",  # Protección contra CSRF
+        MONGO_URI=os.getenv("MONGO_URI"),
+        DB_NAME=os.getenv("DB_NAME", "tienda_musica"),
+        ESTADISTICAS_TTL=int(os.getenv("ESTADISTICAS_TTL", "30")),
+        REPORTES_PROGRAMADOR=os.getenv("REPORTES_PROGRAMADOR", "1") == "1",
+        INVALIDACION_VIGILANTE=os.getenv("INVALIDACION_VIGILANTE", "1") == "1",
+        # Usuarios de demostración de models.USUARIOS si la colección está vacía.
+        # Sus contraseñas son públicas: solo para desarrollo local (ver __main__)
+        USUARIOS_DEMO=os.getenv("USUARIOS_DEMO", "0") == "1",
+    )
+    app.config.update(config or {})
+
+    # gzip/brotli de HTML, CSV y JSON (primero: su after_request corre al final)
+    instalar_compresion(app)
+    # static/ con huella en el nombre y caché de un año (estatico() en plantillas)
+    instalar_estaticos(app)
+    # Tiempo por request, comandos de Mongo y log de requests lentos (Server-Timing)
+    instalar_medicion(app)
+    # Métricas de Prometheus en /metrics (sin login)
+    instalar_metricas(app)
+
+    app.extensions["tienda"] = Tienda(app.config, client)
+    app.register_error_handler(ErrorAPI, respuesta_error_api)
+    app.before_request(preparar_tienda)
+    for regla, vista, opciones in _RUTAS:
+        app.add_url_rule(regla, view_func=vista, **opciones)
+    return app
 
-    generos_reporte = list(Inventario.aggregate(pipeline))
-    return render_template("reportes/generos_populares.html", generos=generos_reporte)
+app = create_app()
 
 if __name__ == "__main__":
+    # Servidor de desarrollo local: con la base vacía se crean los usuarios de demostración
+    app.config["USUARIOS_DEMO"] = os.getenv("USUARIOS_DEMO", "1") == "1"
     app.run(debug=True)
 
 
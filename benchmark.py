@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark de las rutas de la aplicación con datos sintéticos.
+
+Para cada tamaño genera un catálogo reproducible (misma semilla, mismos
+datos) en una base dedicada, recorre todas las rutas GET de app.url_map con
+el test client de Flask y mide latencia p50/p95, comandos de MongoDB (encabezado Server-Timing) y
+memoria pico de Python por request. Los resultados se guardan en JSON para
+comparar entre commits.
+
+Tamaño N: N artistas, 5N clientes, 4N álbumes y 20N ventas. La popularidad
+de artistas, álbumes y clientes sigue una distribución de Zipf, los precios
+una log-normal y las fechas de venta se concentran en los meses recientes.
+
+Con --mongomock no hace falta un servidor (pip install mongomock), pero
+mongomock no implementa $unionWith, $dateTrunc ni $round, no emite eventos
+de comandos y no es representativo en tiempos: sirve para probar el arnés.
+
+Uso:
+    python benchmark.py --tamanos 100 1000 --salida benchmark.json
+    python benchmark.py --mongomock --tamanos 20 --repeticiones 5
+    python benchmark.py --salida nuevo.json --comparar benchmark.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+GENEROS = ["Rock", "Pop", "Jazz", "Blues", "Soul", "Funk", "Metal", "Salsa", "Tango", "Clásica"]
+PESOS_GENEROS = [30, 22, 10, 8, 7, 6, 6, 5, 3, 3]
+PAISES = ["Colombia", "Argentina", "México", "España", "Estados Unidos", "Reino Unido", "Brasil", "Cuba"]
+CANTIDADES = [1, 2, 3, 4, 5]
+PESOS_CANTIDADES = [60, 20, 10, 6, 4]
+
+# Colecciones que se vacían antes de sembrar cada tamaño
+COLECCIONES_BENCHMARK = [
+    "artistas", "clientes", "inventario", "ventas",
+    "resumen_ventas_artistas", "resumen_ventas_clientes",
+    "instantaneas_reportes", "versiones", "bloqueos",
+]
+
+# Rutas GET que no se miden: logout cierra la sesión del benchmark y las
+# otras sirven archivos estáticos, no consultas
+RUTAS_EXCLUIDAS = {"logout", "static", "activo"}
+
+# Colecciones cuyos documentos se pueden pedir por <id> (prefijo del endpoint)
+COLECCIONES_ID = ["artistas", "clientes", "inventario", "ventas"]
+
+# Los reportes se miden sin instantánea ni caché
+REPORTES_FRESCOS = ["estadisticas", "ventas_por_artista", "inventario_bajo", "clientes_activos",
+                    "generos_populares", "paquete", "paquete_zip"]
+
+_SERVER_TIMING_MONGO = re.compile(r'mongo;dur=([\d.]+);desc="(\d+) comandos"')
+
+
+def pesos_zipf(n, s=1.1):
+    return [1 / (i + 1) ** s for i in range(n)]
+
+
+def generar_datos(n, semilla=42, hoy=None):
+    """Documentos sintéticos para un tamaño N (deterministas para una semilla)"""
+    from bson import ObjectId
+
+    rng = random.Random(semilla)
+    hoy = hoy or datetime(2025, 1, 1)
+
+    def nuevo_id():
+        return ObjectId(rng.randbytes(12))
+
+    artistas = [{
+        "_id": nuevo_id(),
+        "nombre": f"Artista {i:06d}",
+        "pais": rng.choice(PAISES),
+        "genero": rng.choices(GENEROS, PESOS_GENEROS)[0],
+        "activo": rng.random() < 0.85,
+    } for i in range(n)]
+
+    clientes = [{
+        "_id": nuevo_id(),
+        "nombre": f"Cliente {i:06d}",
+        "correo": f"cliente{i:06d}@ejemplo.com",
+        "telefono": f"3{rng.randint(100000000, 199999999)}",
+    } for i in range(5 * n)]
+
+    inventario = []
+    for i, artista in enumerate(rng.choices(artistas, pesos_zipf(n), k=4 * n)):
+        inventario.append({
+            "_id": nuevo_id(),
+            "artista_id": artista["_id"],
+            "nombre_artista": artista["nombre"],
+            "album": f"Álbum {i:06d}",
+            "año": rng.randint(1960, 2024),
+            "genero": artista["genero"],
+            "stock": int(rng.expovariate(1 / 12)),
+            "precio_unitario": max(5, int(rng.lognormvariate(math.log(25), 0.4))),
+        })
+
+    pesos_albumes = pesos_zipf(len(inventario), 0.9)
+    pesos_clientes = pesos_zipf(len(clientes), 0.8)
+    ventas = []
+    for _ in range(20 * n):
+        producto = rng.choices(inventario, pesos_albumes)[0]
+        cliente = rng.choices(clientes, pesos_clientes)[0]
+        ventas.append({
+            # Mismos nombres copiados que escribe la app (denormalizacion.py)
+            "cliente_id": cliente["_id"],
+            "nombre_cliente": cliente["nombre"],
+            "artista_id": producto["artista_id"],
+            "nombre_artista": producto["nombre_artista"],
+            "album": producto["album"],
+            "fecha_venta": hoy - timedelta(days=rng.triangular(0, 730, 0), minutes=rng.randint(0, 1439)),
+            "cantidad": rng.choices(CANTIDADES, PESOS_CANTIDADES)[0],
+            "precio_unitario": producto["precio_unitario"],
+        })
+
+    return {"artistas": artistas, "clientes": clientes, "inventario": inventario, "ventas": ventas}
+
+
+def sembrar(db, n, semilla, lote=5000):
+    """Vacía la base de benchmark e inserta los datos de tamaño N"""
+    from indices import crear_indices
+    from instantaneas import PIPELINES, coleccion_filas
+    from resumenes import reconstruir_resumenes
+
+    for nombre in COLECCIONES_BENCHMARK + [coleccion_filas(r) for r in PIPELINES]:
+        db[nombre].drop()
+    datos = generar_datos(n, semilla)
+    for nombre, documentos in datos.items():
+        for i in range(0, len(documentos), lote):
+            db[nombre].insert_many(documentos[i:i + lote], ordered=False)
+    crear_indices(db)
+    reconstruir_resumenes(db)
+    return {nombre: len(documentos) for nombre, documentos in datos.items()}
+
+
+def rutas(aplicacion, db):
+    """
+    (nombre, endpoint, argumentos de url_for) de cada ruta GET de la app.
+
+    Un <id> se llena con el primer documento de la colección del endpoint
+    (ventas_view -> ventas); las rutas con otros parámetros tienen sus
+    argumentos (y variantes con filtros) aquí mismo. Una ruta nueva que no se
+    pueda llenar se omite con un aviso, para agregarla a la lista.
+    """
+    ids = {c: str(db[c].find_one({}, {"_id": 1})["_id"]) for c in COLECCIONES_ID}
+    artista = db["artistas"].find_one({}, {"nombre": 1})
+    argumentos = {
+        "buscar": [("buscar_artistas", {"coleccion": "artistas", "q": artista["nombre"][:9]})],
+        "exportar": [
+            ("exportar_ventas_csv", {"recurso": "ventas", "formato": "csv"}),
+            ("exportar_inventario_bajo_pdf", {"recurso": "inventario-bajo", "formato": "pdf"}),
+        ],
+        "api_listar": [("api_listar_ventas", {"coleccion": "ventas"})],
+        "api_obtener": [("api_obtener_venta", {"coleccion": "ventas", "id": ids["ventas"]})],
+        "api_lote": [("api_lote_ventas", {"coleccion": "ventas", "ids": ids["ventas"]})],
+        "ventas_por_artista": [
+            ("ventas_por_artista", {"fresh": 1}),
+            ("ventas_por_artista_rango", {"desde": "2024-07-01", "hasta": "2024-12-31"}),
+        ],
+        "ventas_por_periodo": [("ventas_por_periodo", {"desde": "2023-01-01", "unidad": "month"})],
+    }
+    argumentos.update({r: [(r, {"fresh": 1})] for r in REPORTES_FRESCOS if r not in argumentos})
+
+    medidas = []
+    for regla in sorted(aplicacion.url_map.iter_rules(), key=lambda r: r.rule):
+        if "GET" not in regla.methods or regla.endpoint in RUTAS_EXCLUIDAS:
+            continue
+        if regla.endpoint in argumentos:
+            medidas += [(nombre, regla.endpoint, args) for nombre, args in argumentos[regla.endpoint]]
+            continue
+        coleccion = regla.endpoint.split("_")[0]
+        if not regla.arguments:
+            medidas.append((regla.endpoint, regla.endpoint, {}))
+        elif regla.arguments == {"id"} and coleccion in ids:
+            medidas.append((regla.endpoint, regla.endpoint, {"id": ids[coleccion]}))
+        else:
+            print(f"  {regla.rule}: parámetros sin valor, no se mide", flush=True)
+    return medidas
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def medir_ruta(cliente, url, repeticiones):
+    """Latencias, comandos de Mongo y memoria pico de una ruta"""
+    respuesta = cliente.get(url)  # calentamiento (cachés, plantillas compiladas)
+    respuesta.get_data()
+    if respuesta.status_code >= 500:
+        # Una página de error no se mide; queda el estado en el resultado
+        return {"estado": respuesta.status_code, "p50_ms": None, "p95_ms": None,
+                "comandos_mongo": None, "mongo_ms": None, "memoria_pico_kb": None}
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        respuesta.get_data()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    cliente.get(url).get_data()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mongo = _SERVER_TIMING_MONGO.search(respuesta.headers.get("Server-Timing", ""))
+    return {
+        "estado": respuesta.status_code,
+        "p50_ms": round(percentil(tiempos, 50), 2),
+        "p95_ms": round(percentil(tiempos, 95), 2),
+        "comandos_mongo": int(mongo.group(2)) if mongo else None,
+        "mongo_ms": float(mongo.group(1)) if mongo else None,
+        "memoria_pico_kb": round(pico / 1024, 1),
+    }
+
+
+def ejecutar(aplicacion, tamanos, repeticiones, semilla):
+    from flask import url_for
+    from app import tienda
+
+    with aplicacion.app_context():
+        db = tienda().db
+
+    resultados = []
+    for n in tamanos:
+        print(f"\n▶ Tamaño {n}: sembrando...", flush=True)
+        documentos = sembrar(db, n, semilla)
+        print("  " + ", ".join(f"{k}={v}" for k, v in documentos.items()), flush=True)
+
+        cliente = aplicacion.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion["usuario"] = "ldaza"
+            sesion["nombre"] = "Benchmark"
+            sesion["rol"] = "administrador"
+
+        medidas = []
+        for nombre, endpoint, argumentos in rutas(aplicacion, db):
+            with aplicacion.test_request_context():
+                url = url_for(endpoint, **argumentos)
+            medida = {"ruta": nombre, "url": url, **medir_ruta(cliente, url, repeticiones)}
+            medidas.append(medida)
+            if medida["p50_ms"] is None:
+                print(f"  {nombre:28s} {medida['estado']}  error, no se mide", flush=True)
+                continue
+            print(f"  {nombre:28s} {medida['estado']}  p50 {medida['p50_ms']:8.2f} ms  "
+                  f"p95 {medida['p95_ms']:8.2f} ms  comandos {medida['comandos_mongo']}  "
+                  f"memoria {medida['memoria_pico_kb']} KB", flush=True)
+        resultados.append({"tamano": n, "documentos": documentos, "rutas": medidas})
+    return resultados
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(anterior, actual, umbral):
+    """Imprime la variación de p95 por ruta; retorna las regresiones"""
+    previos = {(r["tamano"], m["ruta"]): m for r in anterior["resultados"] for m in r["rutas"]}
+    regresiones = []
+    print(f"\nComparación con {anterior.get('commit') or 'resultado anterior'} (p95):")
+    for resultado in actual["resultados"]:
+        for medida in resultado["rutas"]:
+            previo = previos.get((resultado["tamano"], medida["ruta"]))
+            if not previo or not previo["p95_ms"] or medida["p95_ms"] is None:
+                continue
+            cambio = (medida["p95_ms"] - previo["p95_ms"]) / previo["p95_ms"] * 100
+            marca = "⚠️ " if cambio > umbral else "  "
+            print(f"{marca}N={resultado['tamano']:<7} {medida['ruta']:28s} "
+                  f"{previo['p95_ms']:8.2f} → {medida['p95_ms']:8.2f} ms ({cambio:+.1f}%)")
+            if cambio > umbral:
+                regresiones.append((resultado["tamano"], medida["ruta"], cambio))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la tienda de música")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[100, 1000],
+                        help="número de artistas de cada corrida (clientes 5N, álbumes 4N, ventas 20N)")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--db", default="tienda_benchmark",
+                        help="base de datos que se vacía y siembra (nunca la de la aplicación)")
+    parser.add_argument("--mongomock", action="store_true", help="usar mongomock en lugar de MongoDB")
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--umbral", type=float, default=20.0,
+                        help="aumento de p95 (%%) que se considera regresión")
+    args = parser.parse_args()
+
+    # Antes de importar app: sin log de requests lentos durante la medición
+    os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+    client = None
+    if args.mongomock:
+        try:
+            import mongomock
+        except ImportError:
+            print("✗ mongomock no está instalado (pip install mongomock)")
+            return 1
+        client = mongomock.MongoClient()
+
+    from app import create_app
+    # Base dedicada y sin hilos en segundo plano
+    aplicacion = create_app({
+        "DB_NAME": args.db,
+        "REPORTES_PROGRAMADOR": False,
+        "INVALIDACION_VIGILANTE": False,
+    }, client=client)
+
+    actual = {
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "backend": "mongomock" if args.mongomock else "mongodb",
+        "python": sys.version.split()[0],
+        "repeticiones": args.repeticiones,
+        "semilla": args.semilla,
+        "resultados": ejecutar(aplicacion, args.tamanos, args.repeticiones, args.semilla),
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(actual, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+        if comparar(anterior, actual, args.umbral):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Cachés en memoria del proceso.
+
+CacheLRU es un diccionario acotado con expiración (TTL) y desalojo LRU,
+seguro para hilos. CacheNombres lo usa para resolver id -> nombre con una
+sola consulta por clave primaria en lugar de recorrer toda la colección.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from models import to_object_id
+from metricas import CONSULTAS_CACHE
+
+_FALTA = object()
+
+
+class CacheLRU:
+    """Caché LRU con TTL por entrada"""
+
+    def __init__(self, maximo=1024, ttl=300, nombre="cache"):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._aciertos = CONSULTAS_CACHE.labels(nombre, "acierto")
+        self._fallos = CONSULTAS_CACHE.labels(nombre, "fallo")
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, default=None):
+        """Retorna el valor guardado, o default si no existe o expiró"""
+        with self._lock:
+            entrada = self._datos.get(clave, _FALTA)
+            if entrada is _FALTA:
+                self._fallos.inc()
+                return default
+            valor, expira = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                self._fallos.inc()
+                return default
+            self._datos.move_to_end(clave)
+            self._aciertos.inc()
+            return valor
+
+    def guardar(self, clave, valor):
+        """Guarda un valor, desalojando el menos usado si se supera el máximo"""
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave=None):
+        """Elimina una clave, o todo el contenido si no se indica ninguna"""
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheNombres(CacheLRU):
+    """Resuelve _id -> nombre de una colección con caché LRU"""
+
+    def __init__(self, coleccion, campo="nombre", maximo=None, ttl=None):
+        super().__init__(
+            maximo=maximo or int(os.getenv("NOMBRES_CACHE_MAX", "4096")),
+            ttl=ttl or int(os.getenv("NOMBRES_CACHE_TTL", "300")),
+            nombre=f"nombres_{coleccion.name}",
+        )
+        self.coleccion = coleccion
+        self.campo = campo
+
+    def nombre(self, _id, default="N/A"):
+        """Nombre del documento con ese _id (una consulta por clave primaria)"""
+        oid = to_object_id(_id)
+        if oid is None:
+            return default
+        clave = str(oid)
+        valor = self.obtener(clave, _FALTA)
+        if valor is _FALTA:
+            doc = self.coleccion.find_one({"_id": oid}, {self.campo: 1})
+            valor = doc.get(self.campo) if doc else None
+            self.guardar(clave, valor)
+        return valor if valor is not None else default
+
+    def invalidar(self, clave=None):
+        super().invalidar(None if clave is None else str(clave))
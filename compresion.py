@@ -0,0 +1,130 @@
+"""
+Compresión gzip/brotli de las respuestas de texto (HTML, CSV, JSON...).
+
+    COMPRESION_MINIMO        tamaño mínimo del cuerpo a comprimir, bytes (1024)
+    COMPRESION_NIVEL_GZIP    nivel de gzip, 1-9 (6)
+    COMPRESION_NIVEL_BROTLI  calidad de brotli, 0-11 (5)
+
+Brotli se usa si el paquete `brotli` está instalado y el navegador lo
+acepta; si no, gzip. Las exportaciones en streaming se comprimen por
+partes, sin juntar el archivo en memoria. Las respuestas de send_file
+(PDFs) no se tocan.
+"""
+
+import os
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+MINIMO = int(os.getenv("COMPRESION_MINIMO", "1024"))
+NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+NIVEL_BROTLI = int(os.getenv("COMPRESION_NIVEL_BROTLI", "5"))
+
+# Tipos que vale la pena comprimir (las imágenes y PDFs ya vienen comprimidos)
+TIPOS = {
+    "text/html", "text/csv", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "application/x-ndjson",
+}
+
+
+class _Gzip:
+    def __init__(self):
+        # wbits=31: formato gzip (cabecera y CRC), no zlib crudo
+        self._obj = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def comprimir(self, datos):
+        return self._obj.compress(datos)
+
+    def terminar(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=NIVEL_BROTLI)
+
+    def comprimir(self, datos):
+        return self._obj.process(datos)
+
+    def terminar(self):
+        return self._obj.finish()
+
+
+def codificacion_aceptada():
+    """'br', 'gzip' o None según Accept-Encoding y los módulos instalados"""
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas["br"]:
+        return "br"
+    if aceptadas["gzip"]:
+        return "gzip"
+    return None
+
+
+def compresor(codificacion):
+    return _Brotli() if codificacion == "br" else _Gzip()
+
+
+def comprimir(datos, codificacion):
+    """Cuerpo completo comprimido"""
+    c = compresor(codificacion)
+    return c.comprimir(datos) + c.terminar()
+
+
+def comprimir_flujo(partes, codificacion):
+    """Generador que comprime un cuerpo en streaming parte por parte"""
+    c = compresor(codificacion)
+    try:
+        for parte in partes:
+            salida = c.comprimir(parte)
+            if salida:
+                yield salida
+        yield c.terminar()
+    finally:
+        if hasattr(partes, "close"):
+            partes.close()
+
+
+def comprimible(response):
+    if response.mimetype not in TIPOS:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    return not response.direct_passthrough and "Content-Encoding" not in response.headers
+
+
+def instalar(app):
+    """
+    Registra la compresión de respuestas.
+
+    Se instala antes que los demás hooks para que su after_request corra al
+    final, sobre la respuesta ya completa.
+    """
+
+    @app.after_request
+    def comprimir_respuesta(response):
+        if not comprimible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        codificacion = codificacion_aceptada()
+        if codificacion is None:
+            return response
+
+        if response.is_streamed:
+            response.response = comprimir_flujo(response.iter_encoded(), codificacion)
+            response.headers.pop("Content-Length", None)
+        else:
+            datos = response.get_data()
+            if len(datos) < MINIMO:
+                return response
+            response.set_data(comprimir(datos, codificacion))
+
+        response.headers["Content-Encoding"] = codificacion
+        # El cuerpo comprimido es otra representación: el ETag pasa a ser débil
+        etag, debil = response.get_etag()
+        if etag and not debil:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,72 @@
+"""
+GET condicionales (ETag / Last-Modified) a partir de versiones por colección.
+
+Cada escritura incrementa el contador de su colección en `versiones`
+(ver invalidacion.py). El ETag de una página se calcula con los contadores
+de las colecciones que lee, la fecha de su instantánea si es un reporte y
+los datos del request; así, si nada cambió, se responde 304 sin ejecutar
+ninguna consulta pesada.
+"""
+
+import glob
+import hashlib
+import os
+from datetime import timezone
+from bson import json_util
+from instantaneas import INSTANTANEAS
+from invalidacion import VERSIONES
+
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+_huella = None
+
+
+def huella_despliegue():
+    """
+    Hash del código y las plantillas: un despliegue nuevo invalida los ETag
+    (igual en todos los workers de un mismo despliegue).
+    """
+    global _huella
+    if _huella is None:
+        sha = hashlib.sha256()
+        archivos = glob.glob(os.path.join(_RAIZ, "*.py")) + \
+            glob.glob(os.path.join(_RAIZ, "templates", "**", "*.html"), recursive=True)
+        for ruta in sorted(archivos):
+            with open(ruta, "rb") as f:
+                sha.update(f.read())
+        _huella = sha.hexdigest()[:16]
+    return _huella
+
+
+def marcas_colecciones(db, colecciones):
+    """
+    Versiones de las colecciones y la última modificación entre ellas.
+
+    Returns:
+        tuple: ({colección: versión}, datetime UTC o None)
+    """
+    versiones = {c: 0 for c in colecciones}
+    modificado = None
+    for doc in db[VERSIONES].find({"_id": {"$in": list(colecciones)}}):
+        versiones[doc["_id"]] = doc.get("version", 0)
+        if doc.get("modificado") and (modificado is None or doc["modificado"] > modificado):
+            modificado = doc["modificado"]
+    return versiones, modificado
+
+
+def marca_instantanea(db, nombre):
+    """Fecha de generación de la instantánea de un reporte, o None"""
+    doc = db[INSTANTANEAS].find_one({"_id": nombre}, {"generado": 1})
+    return doc.get("generado") if doc else None
+
+
+def calcular_etag(*partes):
+    """ETag (sin comillas) de cualquier combinación de valores BSON"""
+    datos = json_util.dumps([huella_despliegue(), *partes], sort_keys=True)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()[:32]
+
+
+def fecha_http(fecha):
+    """Datetime de MongoDB (UTC sin zona) a la precisión de Last-Modified"""
+    if fecha is None:
+        return None
+    return fecha.replace(tzinfo=timezone.utc, microsecond=0)
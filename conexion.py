@@ -0,0 +1,91 @@
+"""
+Construcción del cliente de MongoDB a partir de variables de entorno.
+
+    MONGO_URI                          cadena de conexión
+    DB_NAME                            base de datos (tienda_musica)
+    MONGO_MAX_POOL_SIZE                conexiones máximas por servidor (50)
+    MONGO_MIN_POOL_SIZE                conexiones que se mantienen abiertas (0)
+    MONGO_MAX_IDLE_MS                  cierre de conexiones ociosas (300000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS        espera máxima por una conexión libre (5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS  espera máxima para elegir servidor (5000)
+    MONGO_CONNECT_TIMEOUT_MS           apertura de sockets (5000)
+    MONGO_SOCKET_TIMEOUT_MS            respuesta de cada operación (30000)
+    MONGO_COMPRESSORS                  compresión del protocolo (zstd,snappy,zlib)
+    MONGO_REPORTES_READ_PREFERENCE     lectura de los reportes (secondaryPreferred)
+    MONGO_REPORTES_MAX_STALENESS       retraso máximo aceptado en secundarios, s (-1 = sin límite)
+
+El cliente se crea con connect=False: no abre sockets ni hilos de monitoreo
+hasta la primera operación. Así, aunque el módulo se importe en el proceso
+maestro de gunicorn (--preload), cada worker conecta después del fork con
+su propio pool.
+"""
+
+import importlib.util
+import os
+from pymongo import MongoClient, ReadPreference
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+# Compresor -> módulo de Python que necesita (zlib viene con Python)
+_MODULOS_COMPRESION = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def _entero(variable, defecto):
+    return int(os.getenv(variable, str(defecto)))
+
+
+def compresores_disponibles(nombres):
+    """Filtra los compresores pedidos a los que tienen su módulo instalado"""
+    disponibles = []
+    for nombre in (n.strip() for n in nombres.split(",")):
+        modulo = _MODULOS_COMPRESION.get(nombre)
+        if modulo and importlib.util.find_spec(modulo) is not None:
+            disponibles.append(nombre)
+    return disponibles
+
+
+def opciones_cliente():
+    """Opciones de MongoClient leídas del entorno"""
+    opciones = {
+        "maxPoolSize": _entero("MONGO_MAX_POOL_SIZE", 50),
+        "minPoolSize": _entero("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _entero("MONGO_MAX_IDLE_MS", 300000),
+        "waitQueueTimeoutMS": _entero("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": _entero("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _entero("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _entero("MONGO_SOCKET_TIMEOUT_MS", 30000),
+        "appname": "musica-vintage",
+        "retryWrites": True,
+        "connect": False,
+    }
+    compresores = compresores_disponibles(os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib"))
+    if compresores:
+        opciones["compressors"] = ",".join(compresores)
+    return opciones
+
+
+def crear_cliente(uri=None, **extra):
+    """MongoClient configurado desde el entorno (extra: p. ej. event_listeners)"""
+    return MongoClient(uri or os.getenv("MONGO_URI"), **{**opciones_cliente(), **extra})
+
+
+def base_datos(client, nombre=None):
+    """Base de datos de la tienda; lecturas y escrituras en el primario"""
+    return client.get_database(nombre or os.getenv("DB_NAME", "tienda_musica"),
+                               read_preference=ReadPreference.PRIMARY)
+
+
+def preferencia_reportes():
+    """Read preference de los reportes (secondaryPreferred por defecto)"""
+    modo = read_pref_mode_from_name(os.getenv("MONGO_REPORTES_READ_PREFERENCE", "secondaryPreferred"))
+    return make_read_preference(modo, None, _entero("MONGO_REPORTES_MAX_STALENESS", -1))
+
+
+def base_reportes(client, nombre=None):
+    """
+    La misma base con la read preference de los reportes.
+
+    Solo para agregaciones de lectura: los datos pueden llegar con el retraso
+    de replicación de los secundarios.
+    """
+    return client.get_database(nombre or os.getenv("DB_NAME", "tienda_musica"),
+                               read_preference=preferencia_reportes())
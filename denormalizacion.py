@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Nombres de artistas y clientes copiados en los documentos que los muestran.
+
+Inventario y ventas guardan nombre_artista / nombre_cliente, y los
+resúmenes de ventas guardan el nombre de su artista o cliente, así que los
+listados y reportes ya no necesitan $lookup. Al escribir, los nombres se
+toman de artistas/clientes (no del formulario). Cuando un artista o cliente
+cambia de nombre, un hilo en segundo plano reparte el cambio con update_many
+por bloques de _id.
+
+Los documentos anteriores a las copias se rellenan solos: al arrancar, la
+app programa propagar_todo una vez por base de datos (una marca en la
+colección migraciones evita que cada worker lo repita).
+
+Uso:
+    python denormalizacion.py    # rellena o corrige todos los nombres copiados
+"""
+
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+from conexion import base_datos, crear_cliente
+from invalidacion import incrementar_version
+from resumenes import RESUMEN_ARTISTAS, RESUMEN_CLIENTES
+
+TAMANO_BLOQUE = int(os.getenv("DENORMALIZACION_BLOQUE", "1000"))
+
+MIGRACIONES = "migraciones"
+MARCA_RELLENO = "nombres_copiados"
+# Un relleno "en curso" más antiguo que esto se da por abandonado (worker caído)
+RELLENO_ABANDONADO = timedelta(hours=1)
+
+# Colección de origen -> copias del nombre: (colección, campo del _id, campo del nombre)
+COPIAS = {
+    "artistas": [
+        ("inventario", "artista_id", "nombre_artista"),
+        ("ventas", "artista_id", "nombre_artista"),
+        (RESUMEN_ARTISTAS, "_id", "nombre"),
+    ],
+    "clientes": [
+        ("ventas", "cliente_id", "nombre_cliente"),
+        (RESUMEN_CLIENTES, "_id", "nombre"),
+    ],
+}
+
+log = logging.getLogger(__name__)
+
+# Un solo hilo: dos renombres seguidos del mismo artista se aplican en orden
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="denormalizacion")
+
+
+def completar_nombres(db, coleccion, docs):
+    """
+    Copia en los documentos (nuevos o editados) los nombres de artista y
+    cliente, con una consulta $in por colección de origen.
+    """
+    for origen, copias in COPIAS.items():
+        for destino, campo_id, campo_nombre in copias:
+            if destino != coleccion:
+                continue
+            ids = list({d[campo_id] for d in docs if d.get(campo_id) is not None})
+            nombres = {o["_id"]: o.get("nombre") for o in db[origen].find({"_id": {"$in": ids}}, {"nombre": 1})}
+            for d in docs:
+                d[campo_nombre] = nombres.get(d.get(campo_id))
+    return docs
+
+
+def propagar_nombre(db, origen, _id, nombre):
+    """
+    Reemplaza el nombre copiado en todos los documentos de un artista o cliente.
+
+    Se actualiza por bloques de TAMANO_BLOQUE _id para que ninguna operación
+    bloquee por mucho tiempo, y solo donde el nombre es distinto (repetirla
+    no escribe nada).
+
+    Returns:
+        dict: documentos modificados por colección
+    """
+    modificados = {}
+    for destino, campo_id, campo_nombre in COPIAS[origen]:
+        filtro = {campo_id: _id, campo_nombre: {"$ne": nombre}}
+        total = 0
+        bloque = []
+        for doc in db[destino].find(filtro, {"_id": 1}).batch_size(TAMANO_BLOQUE):
+            bloque.append(doc["_id"])
+            if len(bloque) >= TAMANO_BLOQUE:
+                total += _actualizar(db[destino], bloque, campo_nombre, nombre)
+                bloque = []
+        if bloque:
+            total += _actualizar(db[destino], bloque, campo_nombre, nombre)
+        modificados[destino] = total
+        if total and destino in ("inventario", "ventas"):
+            # Las páginas en caché de los navegadores (ETag) deben revalidarse
+            incrementar_version(db, destino)
+    return modificados
+
+
+def _actualizar(coleccion, ids, campo_nombre, nombre):
+    return coleccion.update_many({"_id": {"$in": ids}}, {"$set": {campo_nombre: nombre}}).modified_count
+
+
+def _tarea(db, origen, _id, nombre):
+    try:
+        modificados = propagar_nombre(db, origen, _id, nombre)
+        log.info("Nombre de %s %s propagado: %s", origen, _id, modificados)
+    except Exception as e:
+        # Se corrige con la próxima edición o con `python denormalizacion.py`
+        log.warning("No se pudo propagar el nombre de %s %s: %s", origen, _id, e)
+
+
+def _revision(db, origen):
+    try:
+        modificados = propagar_todo(db, [origen])
+        log.info("Nombres de %s revisados: %s", origen, modificados)
+    except Exception as e:
+        log.warning("No se pudieron revisar los nombres de %s: %s", origen, e)
+
+
+def programar_propagacion(db, origen, _id, nombre):
+    """Propaga el nombre en segundo plano (db debe ser la base real, no un LocalProxy)"""
+    return _pool.submit(_tarea, db, origen, _id, nombre)
+
+
+def programar_revision(db, origen):
+    """Revisa en segundo plano las copias de todos los nombres de una colección (db real, no un LocalProxy)"""
+    return _pool.submit(_revision, db, origen)
+
+
+def propagar_todo(db, origenes=COPIAS):
+    """Rellena o corrige los nombres copiados de todos los artistas y clientes"""
+    totales = {}
+    for origen in origenes:
+        for doc in db[origen].find({}, {"nombre": 1}).batch_size(TAMANO_BLOQUE):
+            for destino, total in propagar_nombre(db, origen, doc["_id"], doc.get("nombre")).items():
+                totales[destino] = totales.get(destino, 0) + total
+    return totales
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _relleno(db):
+    try:
+        modificados = propagar_todo(db)
+        db[MIGRACIONES].update_one({"_id": MARCA_RELLENO}, {"$set": {"estado": "completo", "fecha": _ahora()}})
+        log.info("Nombres copiados rellenados: %s", modificados)
+    except Exception as e:
+        # La marca queda "en curso" y otro arranque lo reintenta al expirar
+        log.warning("No se pudieron rellenar los nombres copiados: %s", e)
+
+
+def programar_relleno(db):
+    """
+    Programa propagar_todo en segundo plano si esta base aún no lo completó.
+
+    La marca se toma con un upsert: solo un worker la obtiene, y una marca
+    "en curso" abandonada por más de RELLENO_ABANDONADO se puede volver a tomar.
+
+    Returns:
+        Future, o None si ya está hecho o lo hace otro proceso
+    """
+    try:
+        db[MIGRACIONES].find_one_and_update(
+            {"_id": MARCA_RELLENO, "estado": "en_curso", "fecha": {"$lt": _ahora() - RELLENO_ABANDONADO}},
+            {"$set": {"estado": "en_curso", "fecha": _ahora()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return None
+    return _pool.submit(_relleno, db)
+
+
+def main():
+    load_dotenv()
+    db = base_datos(crear_cliente())
+
+    for destino, total in propagar_todo(db).items():
+        print(f"✓ {destino}: {total} documentos actualizados")
+    db[MIGRACIONES].replace_one({"_id": MARCA_RELLENO}, {"estado": "completo", "fecha": _ahora()}, upsert=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Archivos estáticos con huella en el nombre y caché de un año.
+
+Las plantillas piden `estatico('styles.css')`, que devuelve una URL como
+/activos/styles.3f9a0c1b2d4e.css con el hash del contenido. Como el nombre
+cambia cuando cambia el archivo, esas URLs se sirven con
+`Cache-Control: public, max-age=31536000, immutable` y el navegador no
+vuelve a pedirlas. Una huella vieja (p. ej. una página en caché de antes
+de un despliegue) recibe el archivo actual sin caché de larga duración.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+from flask import abort, current_app, request, url_for
+from werkzeug.security import safe_join
+
+UN_ANO = 31536000
+LARGO_HUELLA = 12
+
+_NOMBRE_CON_HUELLA = re.compile(r"^(?P<base>.+)\.(?P<huella>[0-9a-f]{%d})(?P<ext>\.[^./]+)$" % LARGO_HUELLA)
+
+# ruta -> (mtime, huella); el mtime permite editar archivos en desarrollo
+_huellas = {}
+
+
+def huella(nombre):
+    """Hash corto del contenido de un archivo de static/"""
+    ruta = safe_join(current_app.static_folder, nombre)
+    if ruta is None or not os.path.isfile(ruta):
+        return None
+    mtime = os.path.getmtime(ruta)
+    guardada = _huellas.get(ruta)
+    if guardada and guardada[0] == mtime:
+        return guardada[1]
+    with open(ruta, "rb") as f:
+        valor = hashlib.sha256(f.read()).hexdigest()[:LARGO_HUELLA]
+    _huellas[ruta] = (mtime, valor)
+    return valor
+
+
+def nombre_con_huella(nombre):
+    """'styles.css' -> 'styles.<huella>.css'"""
+    base, ext = os.path.splitext(nombre)
+    return f"{base}.{huella(nombre)}{ext}"
+
+
+def estatico(nombre):
+    """URL con huella de un archivo de static/ (para las plantillas)"""
+    if huella(nombre) is None:
+        # Archivo inexistente: se deja la URL normal para que el 404 se note
+        return url_for("static", filename=nombre)
+    return url_for("activo", archivo=nombre_con_huella(nombre))
+
+
+def instalar(app):
+    """Registra la ruta /activos y la función estatico() en las plantillas"""
+    app.jinja_env.globals["estatico"] = estatico
+
+    @app.route("/activos/<path:archivo>")
+    def activo(archivo):
+        partes = _NOMBRE_CON_HUELLA.match(archivo)
+        if not partes:
+            abort(404)
+        nombre = partes["base"] + partes["ext"]
+        actual = huella(nombre)
+        if actual is None:
+            abort(404)
+        ruta = safe_join(current_app.static_folder, nombre)
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        response = current_app.response_class(datos, mimetype=mimetypes.guess_type(nombre)[0])
+        response.set_etag(actual)
+        if partes["huella"] == actual:
+            response.headers["Cache-Control"] = f"public, max-age={UN_ANO}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
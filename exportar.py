@@ -0,0 +1,84 @@
+"""
+Exportación en streaming a CSV y NDJSON.
+
+Las filas se leen de un cursor de MongoDB con batch_size acotado y se
+escriben en bloques pequeños, así una exportación de millones de ventas
+nunca materializa una lista en memoria.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from bson import ObjectId
+
+LOTE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Tamaño aproximado (en caracteres) de cada bloque enviado al cliente
+TAMANO_BLOQUE = 64 * 1024
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Columnas exportadas por recurso, en orden
+COLUMNAS = {
+    "artistas": ["_id", "nombre", "pais", "genero", "activo"],
+    "clientes": ["_id", "nombre", "correo", "telefono"],
+    "inventario": ["_id", "artista_id", "nombre_artista", "album", "año", "genero", "stock", "precio_unitario"],
+    "ventas": ["_id", "fecha_venta", "nombre_cliente", "nombre_artista", "album", "cantidad", "precio_unitario", "total_venta"],
+    "estadisticas": ["total_artistas", "total_clientes", "total_productos", "total_ventas", "ingresos_totales", "stock_total"],
+    "ventas-por-artista": ["artista", "unidades", "ingresos", "transacciones"],
+    "inventario-bajo": ["_id", "nombre", "artista_nombre", "stock", "precio_unitario", "valor_total"],
+    "clientes-activos": ["cliente_id", "cliente_nombre", "compras", "cantidad_articulos", "gasto_total"],
+    "generos-populares": ["genero", "cantidad_productos", "stock_disponible", "valor_total", "valor_promedio"],
+    "ventas-por-periodo": ["periodo", "transacciones", "unidades", "ingresos"],
+}
+
+
+def valor_exportable(valor):
+    """Convierte tipos BSON a valores serializables en texto"""
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def filas_csv(documentos, columnas):
+    """Genera el CSV en bloques: encabezado y una fila por documento"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for doc in documentos:
+        writer.writerow([valor_exportable(doc.get(c)) for c in columnas])
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def filas_ndjson(documentos, columnas):
+    """Genera NDJSON en bloques: un objeto JSON por línea"""
+    partes = []
+    tamano = 0
+    for doc in documentos:
+        linea = json.dumps(
+            {c: valor_exportable(doc.get(c)) for c in columnas}, ensure_ascii=False
+        ) + "\n"
+        partes.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_BLOQUE:
+            yield "".join(partes)
+            partes, tamano = [], 0
+    if partes:
+        yield "".join(partes)
+
+
+def generar_exportacion(documentos, columnas, formato):
+    """Generador de texto para el formato pedido (csv o ndjson)"""
+    if formato == "csv":
+        return filas_csv(documentos, columnas)
+    return filas_ndjson(documentos, columnas)
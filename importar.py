@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Importación masiva de catálogo y ventas desde CSV o NDJSON.
+
+Las filas se leen en streaming, se normalizan por bloques con los mismos
+normalizadores de models.py y se escriben con bulk_write no ordenado.
+Artistas, clientes e inventario se insertan o actualizan (upsert) por su
+clave natural; las ventas se insertan y al final se recalculan los resúmenes.
+
+Las ventas importadas son históricas: no descuentan stock del inventario
+(ese stock ya se vendió antes de la importación). Las ventas nuevas se
+registran con registro_ventas, que sí lo descuenta.
+
+Uso:
+    python importar.py artistas catalogo.csv
+    python importar.py inventario catalogo.ndjson --formato ndjson
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from models import (
+    normalize_artista, normalize_cliente,
+    normalize_inventario, normalize_venta
+)
+from conexion import base_datos, crear_cliente
+from denormalizacion import COPIAS, completar_nombres, programar_revision
+from invalidacion import incrementar_version
+from resumenes import reconstruir_resumenes
+
+TAMANO_BLOQUE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+MAXIMO_ERRORES = 1000
+AVISO_VENTAS = "Ventas importadas como históricas: no se descontó stock del inventario"
+
+
+def _venta(fila):
+    doc = normalize_venta(fila)
+    doc["fecha_venta"] = datetime.fromisoformat(doc["fecha_venta"].replace("Z", ""))
+    return doc
+
+
+def _inventario(fila):
+    return normalize_inventario(fila)
+
+
+# Colección -> (normalizador, campos de la clave natural; None = solo insertar)
+IMPORTADORES = {
+    "artistas": (normalize_artista, ["nombre"]),
+    "clientes": (normalize_cliente, ["correo"]),
+    "inventario": (_inventario, ["artista_id", "album"]),
+    "ventas": (_venta, None),
+}
+
+
+class FilaInvalida:
+    """Línea que no se pudo leer; importar() la reporta con su número de fila"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def leer_filas(archivo, formato="csv"):
+    """Genera dicts desde un archivo de texto CSV (con encabezado) o NDJSON"""
+    if formato == "ndjson":
+        for linea in archivo:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError as e:
+                yield FilaInvalida(f"JSON inválido: {e}")
+                continue
+            yield fila if isinstance(fila, dict) else FilaInvalida("Se espera un objeto JSON")
+    else:
+        yield from csv.DictReader(archivo)
+
+
+def _bloques(filas, tamano):
+    bloque = []
+    for numero, fila in enumerate(filas, start=1):
+        bloque.append((numero, fila))
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _resolver_artistas(db, bloque):
+    """Completa artista_id a partir de nombre_artista con una consulta por bloque"""
+    # Filas inválidas o con un nombre que no es texto quedan para el normalizador
+    pendientes = [f for _, f in bloque if isinstance(f, dict) and not f.get("artista_id")
+                  and isinstance(f.get("nombre_artista"), str) and f["nombre_artista"].strip()]
+    if not pendientes:
+        return
+    nombres = {f["nombre_artista"].strip() for f in pendientes}
+    ids = {a["nombre"]: str(a["_id"])
+           for a in db["artistas"].find({"nombre": {"$in": list(nombres)}}, {"nombre": 1})}
+    for fila in pendientes:
+        fila["artista_id"] = ids.get(fila["nombre_artista"].strip())
+
+
+def _operacion(doc, clave):
+    if clave is None:
+        return InsertOne(doc)
+    filtro = {campo: doc[campo] for campo in clave}
+    if any(v in (None, "") for v in filtro.values()):
+        raise ValueError(f"Clave natural incompleta: {', '.join(clave)}")
+    return UpdateOne(filtro, {"$set": doc}, upsert=True)
+
+
+def importar(db, coleccion, filas, tamano=TAMANO_BLOQUE):
+    """
+    Importa filas en bloques con bulk_write(ordered=False).
+
+    Args:
+        db: base de datos de la tienda (no un LocalProxy: la revisión de
+            nombres copiados corre en otro hilo)
+        coleccion: artistas, clientes, inventario o ventas
+        filas: iterable de dicts (ver leer_filas)
+        tamano: filas por bloque
+
+    Returns:
+        dict: procesadas, insertadas, actualizadas, errores por fila y un
+        aviso (las ventas no descuentan stock)
+    """
+    normalizar, clave = IMPORTADORES[coleccion]
+    reporte = {"procesadas": 0, "insertadas": 0, "actualizadas": 0, "errores": [],
+               "aviso": AVISO_VENTAS if coleccion == "ventas" else None}
+
+    def _error(numero, mensaje):
+        if len(reporte["errores"]) < MAXIMO_ERRORES:
+            reporte["errores"].append({"fila": numero, "error": mensaje})
+
+    for bloque in _bloques(filas, tamano):
+        if coleccion in ("inventario", "ventas"):
+            _resolver_artistas(db, bloque)
+
+        docs = []
+        for numero, fila in bloque:
+            reporte["procesadas"] += 1
+            if isinstance(fila, FilaInvalida):
+                _error(numero, fila.error)
+                continue
+            try:
+                docs.append((numero, normalizar(fila)))
+            except Exception as e:
+                _error(numero, str(e))
+        # Copia de los nombres de artista/cliente, con una consulta $in por bloque
+        completar_nombres(db, coleccion, [doc for _, doc in docs])
+
+        operaciones, numeros = [], []
+        for numero, doc in docs:
+            try:
+                operaciones.append(_operacion(doc, clave))
+                numeros.append(numero)
+            except ValueError as e:
+                _error(numero, str(e))
+        if not operaciones:
+            continue
+
+        try:
+            resultado = db[coleccion].bulk_write(operaciones, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            resultado = e.details
+            for fallo in resultado.get("writeErrors", []):
+                _error(numeros[fallo["index"]], fallo.get("errmsg", "Error de escritura"))
+        reporte["insertadas"] += resultado.get("nInserted", 0) + resultado.get("nUpserted", 0)
+        reporte["actualizadas"] += resultado.get("nMatched", 0)
+
+    if reporte["insertadas"] or reporte["actualizadas"]:
+        incrementar_version(db, coleccion)
+    if coleccion == "ventas" and reporte["insertadas"]:
+        reconstruir_resumenes(db)
+    if coleccion in COPIAS and reporte["actualizadas"]:
+        # Un upsert por clave natural puede haber cambiado algún nombre
+        programar_revision(db, coleccion)
+    reporte["errores"].sort(key=lambda e: e["fila"])
+    return reporte
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de la tienda de música")
+    parser.add_argument("coleccion", choices=sorted(IMPORTADORES))
+    parser.add_argument("archivo", help="ruta del archivo, o - para stdin")
+    parser.add_argument("--formato", choices=["csv", "ndjson"], default=None,
+                        help="por defecto se deduce de la extensión")
+    args = parser.parse_args()
+    formato = args.formato or ("ndjson" if args.archivo.endswith((".ndjson", ".jsonl")) else "csv")
+
+    load_dotenv()
+    db = base_datos(crear_cliente())
+
+    if args.archivo == "-":
+        archivo = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")
+    else:
+        archivo = open(args.archivo, encoding="utf-8-sig", newline="")
+    with archivo:
+        reporte = importar(db, args.coleccion, leer_filas(archivo, formato))
+
+    print(f"✓ Procesadas: {reporte['procesadas']}")
+    print(f"✓ Insertadas: {reporte['insertadas']}")
+    print(f"✓ Actualizadas: {reporte['actualizadas']}")
+    if reporte["aviso"]:
+        print(f"⚠️  {reporte['aviso']}")
+    for error in reporte["errores"]:
+        print(f"  ✗ Fila {error['fila']}: {error['error']}")
+    return 1 if reporte["errores"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
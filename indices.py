@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de índices de la tienda.
+
+Cada ordenamiento y filtro de app.py tiene aquí su índice. La app
+los crea al arrancar (create_indexes es idempotente) y este script permite
+crearlos a mano y verificar con explain() que ningún reporte hace COLLSCAN.
+
+Uso:
+    python indices.py            # crea los índices
+    python indices.py --explain  # falla (código 1) si algún reporte hace COLLSCAN
+"""
+
+import argparse
+import sys
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from conexion import base_datos, crear_cliente
+from reportes import REPORTES
+from resumenes import RESUMEN_ARTISTAS, RESUMEN_CLIENTES
+
+INDICES = {
+    "artistas": [
+        # Listado paginado por (nombre, _id)
+        IndexModel([("nombre", ASCENDING), ("_id", ASCENDING)], name="nombre_id"),
+    ],
+    "clientes": [
+        IndexModel([("nombre", ASCENDING), ("_id", ASCENDING)], name="nombre_id"),
+        # Clave natural de la importación masiva
+        IndexModel([("correo", ASCENDING)], name="correo"),
+    ],
+    "inventario": [
+        IndexModel([("album", ASCENDING), ("_id", ASCENDING)], name="album_id"),
+        # Reporte inventario_bajo: stock < 5
+        IndexModel([("stock", ASCENDING)], name="stock"),
+        # Reporte generos_populares
+        IndexModel([("genero", ASCENDING)], name="genero"),
+        # Propagación de nombres de artista (denormalizacion.py)
+        IndexModel([("artista_id", ASCENDING)], name="artista_id"),
+        # Descuento de stock al vender y clave natural de la importación
+        IndexModel([("artista_id", ASCENDING), ("album", ASCENDING)], name="artista_album"),
+    ],
+    "ventas": [
+        # Listado paginado por (fecha_venta, _id) descendente
+        IndexModel([("fecha_venta", DESCENDING), ("_id", DESCENDING)], name="fecha_venta_id"),
+        # Reconstrucción de los resúmenes: cantidad > 0
+        IndexModel([("cantidad", ASCENDING)], name="cantidad"),
+        IndexModel([("cliente_id", ASCENDING)], name="cliente_id"),
+        IndexModel([("artista_id", ASCENDING)], name="artista_id"),
+    ],
+    # Reportes ventas_por_artista y clientes_activos leen los resúmenes
+    RESUMEN_ARTISTAS: [
+        IndexModel([("ingresos", DESCENDING)], name="ingresos"),
+    ],
+    RESUMEN_CLIENTES: [
+        IndexModel([("gasto_total", DESCENDING)], name="gasto_total"),
+    ],
+}
+
+
+def crear_indices(db):
+    """Crea todos los índices del manifiesto. Es seguro llamarla varias veces"""
+    creados = {}
+    for nombre, modelos in INDICES.items():
+        creados[nombre] = db[nombre].create_indexes(modelos)
+    return creados
+
+
+def etapas_plan(plan):
+    """Recorre un resultado de explain() y retorna las etapas del plan ganador"""
+    etapas = []
+    if isinstance(plan, dict):
+        for clave, valor in plan.items():
+            if clave == "rejectedPlans":
+                continue
+            if clave == "stage" and isinstance(valor, str):
+                etapas.append(valor)
+            else:
+                etapas.extend(etapas_plan(valor))
+    elif isinstance(plan, list):
+        for valor in plan:
+            etapas.extend(etapas_plan(valor))
+    return etapas
+
+
+def explicar_reportes(db):
+    """
+    Ejecuta explain() sobre cada pipeline de reporte.
+
+    Returns:
+        list: tuplas (reporte, etapas del plan, True si hace COLLSCAN)
+    """
+    resultados = []
+    for nombre, (coleccion, pipeline) in REPORTES.items():
+        plan = db.command("aggregate", coleccion, pipeline=pipeline(), explain=True)
+        etapas = etapas_plan(plan)
+        resultados.append((nombre, etapas, "COLLSCAN" in etapas))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índices de la tienda de música")
+    parser.add_argument("--explain", action="store_true",
+                        help="verificar que ningún reporte haga COLLSCAN")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = base_datos(crear_cliente())
+
+    for nombre, creados in crear_indices(db).items():
+        print(f"✓ {nombre}: {', '.join(creados)}")
+
+    if not args.explain:
+        return 0
+
+    fallos = 0
+    print()
+    for nombre, etapas, collscan in explicar_reportes(db):
+        estado = "❌ COLLSCAN" if collscan else "✅"
+        print(f"{estado} {nombre}: {' > '.join(etapas)}")
+        fallos += collscan
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Instantáneas precalculadas de los reportes.
+
+Un hilo por proceso ejecuta cada pipeline de reporte cada
+REPORTES_INTERVALO segundos y guarda las filas junto con la fecha de
+generación. Solo refresca el proceso que tiene el bloqueo de líder en
+MongoDB, así varios workers de gunicorn no repiten las mismas agregaciones.
+
+Las filas van en una colección por reporte (instantanea_<reporte>), un
+documento por fila marcado con la versión del refresco, así ningún reporte
+choca con el límite de 16 MB por documento. El documento del reporte en
+instantaneas_reportes apunta a la versión vigente; las filas de la versión
+anterior se conservan hasta el siguiente refresco para no cortar una
+lectura en curso.
+
+Uso:
+    python instantaneas.py    # refresca todas las instantáneas una vez
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from conexion import base_reportes, crear_cliente
+from reportes import REPORTES, pipeline_estadisticas
+
+INSTANTANEAS = "instantaneas_reportes"
+BLOQUEOS = "bloqueos"
+BLOQUEO_LIDER = "instantaneas"
+
+INTERVALO = int(os.getenv("REPORTES_INTERVALO", "300"))
+LOTE_FILAS = 1000
+
+# Reporte -> (colección, función que retorna el pipeline)
+PIPELINES = {
+    "estadisticas": ("ventas", pipeline_estadisticas),
+    **REPORTES,
+}
+
+log = logging.getLogger(__name__)
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def coleccion_filas(nombre):
+    return f"instantanea_{nombre}"
+
+
+def refrescar_instantanea(db, nombre):
+    """Ejecuta el pipeline de un reporte y reemplaza su instantánea"""
+    coleccion, pipeline = PIPELINES[nombre]
+    filas = db[coleccion_filas(nombre)]
+    filas.create_index([("v", ASCENDING), ("i", ASCENDING)], name="version_orden")
+    version = ObjectId()
+    inicio = time.perf_counter()
+
+    # Las filas se escriben por lotes a medida que llegan del cursor
+    total, lote = 0, []
+    for fila in db[coleccion].aggregate(pipeline(), batchSize=LOTE_FILAS):
+        lote.append({"v": version, "i": total, "fila": fila})
+        total += 1
+        if len(lote) >= LOTE_FILAS:
+            filas.insert_many(lote, ordered=False)
+            lote = []
+    if lote:
+        filas.insert_many(lote, ordered=False)
+
+    anterior = db[INSTANTANEAS].find_one_and_replace(
+        {"_id": nombre},
+        {
+            "version": version,
+            "total": total,
+            "generado": _ahora(),
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        },
+        upsert=True,
+    )
+    # Se conserva la versión anterior (puede haber una lectura en curso)
+    conservar = [version] + ([anterior["version"]] if anterior and anterior.get("version") else [])
+    filas.delete_many({"v": {"$nin": conservar}})
+    return total
+
+
+def refrescar_instantaneas(db):
+    """Refresca todas las instantáneas; un reporte con error no detiene al resto"""
+    resultados = {}
+    for nombre in PIPELINES:
+        try:
+            resultados[nombre] = refrescar_instantanea(db, nombre)
+        except Exception as e:
+            # No solo PyMongoError: p. ej. InvalidDocument no debe matar al programador
+            log.warning("No se pudo refrescar el reporte %s: %s", nombre, e)
+            resultados[nombre] = None
+    return resultados
+
+
+def leer_instantanea(db, nombre):
+    """
+    Última instantánea del reporte, o None si no existe.
+
+    Returns:
+        dict: generado, total y filas (iterador que lee las filas por lotes)
+    """
+    doc = db[INSTANTANEAS].find_one({"_id": nombre})
+    if doc is None or "version" not in doc:
+        return None
+    cursor = db[coleccion_filas(nombre)].find(
+        {"v": doc["version"]}, {"_id": 0, "fila": 1}
+    ).sort("i", ASCENDING).batch_size(LOTE_FILAS)
+    return {**doc, "filas": (d["fila"] for d in cursor)}
+
+
+def adquirir_liderazgo(db, dueno, duracion):
+    """
+    Toma o renueva el bloqueo de líder por `duracion` segundos.
+
+    El upsert solo coincide si el bloqueo expiró o ya es nuestro; si otro
+    proceso lo tiene vigente, el upsert choca con su _id y no somos líder.
+    """
+    ahora = _ahora()
+    try:
+        db[BLOQUEOS].find_one_and_update(
+            {"_id": BLOQUEO_LIDER, "$or": [{"expira": {"$lt": ahora}}, {"dueno": dueno}]},
+            {"$set": {"dueno": dueno, "expira": ahora + timedelta(seconds=duracion)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+class Programador:
+    """Hilo en segundo plano que refresca las instantáneas si es el líder"""
+
+    def __init__(self, db, intervalo=INTERVALO):
+        self.db = db
+        self.intervalo = intervalo
+        self.dueno = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Arranca el hilo (idempotente)"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ciclo, name="instantaneas", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            try:
+                # El bloqueo dura dos intervalos: si el líder muere, otro lo toma
+                if adquirir_liderazgo(self.db, self.dueno, self.intervalo * 2):
+                    refrescar_instantaneas(self.db)
+            except Exception as e:
+                # El hilo sigue vivo: el próximo ciclo lo vuelve a intentar
+                log.warning("Programador de reportes: %s", e)
+            self._detener.wait(self.intervalo)
+
+
+def main():
+    load_dotenv()
+    db = base_reportes(crear_cliente())
+
+    for nombre, total in refrescar_instantaneas(db).items():
+        if total is None:
+            print(f"✗ {nombre}: error")
+        else:
+            print(f"✓ {nombre}: {total} filas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Medición por request: tiempo total, comandos de MongoDB y renderizado.
+
+MedidorComandos es un CommandListener de pymongo que suma los comandos
+ejecutados durante el request en curso (los hilos en segundo plano no
+cuentan). instalar() agrega los hooks de Flask que publican los totales en
+el encabezado Server-Timing y registran en el log de requests lentos los
+comandos más costosos.
+"""
+
+import logging
+import os
+import time
+from contextvars import ContextVar
+from bson import json_util
+from flask import request, template_rendered, before_render_template
+from pymongo import monitoring
+
+UMBRAL_LENTO_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Comandos más lentos guardados por request para el log
+COMANDOS_LOG = 3
+LARGO_COMANDO = 1000
+
+# Campos de protocolo que no aportan al diagnóstico
+_CAMPOS_OMITIDOS = {"$db", "lsid", "$clusterTime", "$readPreference", "txnNumber", "autocommit"}
+
+log = logging.getLogger(__name__)
+
+_medicion = ContextVar("medicion", default=None)
+
+
+class Medicion:
+    """Acumulado de un request"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.comandos = 0
+        self.mongo_ms = 0.0
+        self.plantilla_ms = 0.0
+        self.lentos = []
+        self._en_curso = {}
+        self._plantilla_inicio = None
+
+    def registrar(self, nombre, duracion_ms, comando):
+        self.comandos += 1
+        self.mongo_ms += duracion_ms
+        self.lentos.append((duracion_ms, nombre, comando))
+        self.lentos.sort(key=lambda c: c[0], reverse=True)
+        del self.lentos[COMANDOS_LOG:]
+
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def server_timing(self):
+        return ", ".join([
+            f"app;dur={self.total_ms():.1f}",
+            f'mongo;dur={self.mongo_ms:.1f};desc="{self.comandos} comandos"',
+            f"plantilla;dur={self.plantilla_ms:.1f}",
+        ])
+
+
+def resumen_comando(comando):
+    """Comando como texto acotado, sin los campos de protocolo"""
+    texto = json_util.dumps({k: v for k, v in comando.items() if k not in _CAMPOS_OMITIDOS})
+    if len(texto) > LARGO_COMANDO:
+        texto = texto[:LARGO_COMANDO] + "…"
+    return texto
+
+
+class MedidorComandos(monitoring.CommandListener):
+    """Suma la duración de cada comando al request activo en este contexto"""
+
+    def started(self, event):
+        medicion = _medicion.get()
+        if medicion is not None:
+            medicion._en_curso[event.request_id] = dict(event.command)
+
+    def succeeded(self, event):
+        self._terminar(event)
+
+    def failed(self, event):
+        self._terminar(event)
+
+    def _terminar(self, event):
+        medicion = _medicion.get()
+        if medicion is None:
+            return
+        comando = medicion._en_curso.pop(event.request_id, {})
+        medicion.registrar(event.command_name, event.duration_micros / 1000, comando)
+
+
+def _antes_de_plantilla(sender, template, context, **extra):
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion._plantilla_inicio = time.perf_counter()
+
+
+def _plantilla_renderizada(sender, template, context, **extra):
+    medicion = _medicion.get()
+    if medicion is not None and medicion._plantilla_inicio is not None:
+        medicion.plantilla_ms += (time.perf_counter() - medicion._plantilla_inicio) * 1000
+        medicion._plantilla_inicio = None
+
+
+def instalar(app):
+    """Registra los hooks de medición en la aplicación Flask"""
+    before_render_template.connect(_antes_de_plantilla, app)
+    template_rendered.connect(_plantilla_renderizada, app)
+
+    @app.before_request
+    def iniciar_medicion():
+        _medicion.set(Medicion())
+
+    @app.after_request
+    def publicar_medicion(response):
+        medicion = _medicion.get()
+        if medicion is None:
+            return response
+        response.headers["Server-Timing"] = medicion.server_timing()
+        total = medicion.total_ms()
+        if total >= UMBRAL_LENTO_MS:
+            detalle = "".join(
+                f"\n  {duracion:.1f} ms {nombre}: {resumen_comando(comando)}"
+                for duracion, nombre, comando in medicion.lentos
+            )
+            log.warning(
+                "Request lento %s %s: %.1f ms, %d comandos (%.1f ms en Mongo), %.1f ms en plantillas%s",
+                request.method, request.full_path.rstrip("?"), total,
+                medicion.comandos, medicion.mongo_ms, medicion.plantilla_ms, detalle,
+            )
+        return response
+
+    @app.teardown_request
+    def terminar_medicion(exc):
+        _medicion.set(None)
@@ -0,0 +1,161 @@
+"""
+Invalidación de cachés entre procesos.
+
+Cada worker de gunicorn tiene sus propias cachés en memoria. El Vigilante
+escucha los change streams de MongoDB sobre las colecciones de la tienda y
+avisa a las cachés suscritas, así un cambio hecho en un worker invalida la
+misma clave en todos los demás sin bajar el TTL.
+
+Sin replica set (por ejemplo un mongod local) no hay change streams. En ese
+caso se consulta periódicamente un contador de versión por colección, que
+cada escritura incrementa con publicar() o incrementar_version().
+"""
+
+import logging
+import os
+import threading
+from pymongo.errors import OperationFailure, PyMongoError
+
+VERSIONES = "versiones"
+COLECCIONES = ["artistas", "clientes", "inventario", "ventas"]
+
+INTERVALO_SONDEO = float(os.getenv("INVALIDACION_INTERVALO", "2"))
+# Espera máxima de cada lectura del change stream, para poder detener el hilo
+ESPERA_MS = 1000
+# Operaciones que afectan a toda la colección
+OPERACIONES_COLECCION = {"drop", "rename", "dropDatabase", "invalidate"}
+
+log = logging.getLogger(__name__)
+
+
+def incrementar_version(db, coleccion, session=None):
+    """Incrementa el contador de versión de una colección y su fecha de modificación"""
+    db[VERSIONES].update_one(
+        {"_id": coleccion},
+        {"$inc": {"version": 1}, "$currentDate": {"modificado": True}},
+        upsert=True,
+        session=session,
+    )
+
+
+def leer_versiones(db, colecciones=COLECCIONES):
+    """Contadores de versión actuales: {colección: versión}"""
+    versiones = {c: 0 for c in colecciones}
+    for doc in db[VERSIONES].find({"_id": {"$in": list(colecciones)}}):
+        versiones[doc["_id"]] = doc.get("version", 0)
+    return versiones
+
+
+class Vigilante:
+    """
+    Hilo que reparte eventos de invalidación a las cachés suscritas.
+
+    Una suscripción es una función que recibe el _id del documento cambiado,
+    o None si hay que invalidar todo (CacheLRU.invalidar sirve tal cual).
+    """
+
+    def __init__(self, db, colecciones=COLECCIONES, intervalo=INTERVALO_SONDEO):
+        self.db = db
+        self.colecciones = list(colecciones)
+        self.intervalo = intervalo
+        self.modo = None
+        self._suscripciones = {c: [] for c in self.colecciones}
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def suscribir(self, coleccion, funcion):
+        self._suscripciones[coleccion].append(funcion)
+
+    def notificar(self, coleccion, _id=None):
+        """Invalida las cachés de este proceso suscritas a la colección"""
+        for funcion in self._suscripciones.get(coleccion, []):
+            try:
+                funcion(_id)
+            except Exception as e:
+                log.warning("Error al invalidar caché de %s: %s", coleccion, e)
+
+    def notificar_todo(self):
+        for coleccion in self.colecciones:
+            self.notificar(coleccion)
+
+    def publicar(self, coleccion, _id=None):
+        """
+        Registra una escritura: invalida de inmediato en este proceso e
+        incrementa la versión para los demás (modo sondeo).
+        """
+        self.notificar(coleccion, _id)
+        try:
+            incrementar_version(self.db, coleccion)
+        except PyMongoError as e:
+            log.warning("No se pudo incrementar la versión de %s: %s", coleccion, e)
+
+    def iniciar(self):
+        """Arranca el hilo (idempotente)"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ciclo, name="invalidacion", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _ciclo(self):
+        while not self._detener.is_set():
+            try:
+                self._escuchar_cambios()
+            except OperationFailure as e:
+                # Standalone sin replica set: los change streams no existen
+                log.info("Change streams no disponibles (%s); se usa sondeo de versiones", e)
+                self._sondear()
+                return
+            except PyMongoError as e:
+                log.warning("Change stream interrumpido: %s", e)
+                self._detener.wait(self.intervalo)
+
+    def _escuchar_cambios(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": self.colecciones}}}]
+        token = None
+        while not self._detener.is_set():
+            try:
+                with self.db.watch(pipeline, resume_after=token, max_await_time_ms=ESPERA_MS) as stream:
+                    self.modo = "change_stream"
+                    # Lo cambiado antes de abrir (o reabrir) el stream no llega como evento
+                    self.notificar_todo()
+                    while not self._detener.is_set() and stream.alive:
+                        cambio = stream.try_next()
+                        token = stream.resume_token
+                        if cambio is not None:
+                            self._procesar(cambio)
+            except OperationFailure as e:
+                if token is None:
+                    raise
+                # El token ya no está en el oplog: se reabre desde ahora
+                log.warning("No se pudo reanudar el change stream: %s", e)
+                token = None
+
+    def _procesar(self, cambio):
+        coleccion = cambio.get("ns", {}).get("coll")
+        if cambio["operationType"] in OPERACIONES_COLECCION:
+            if coleccion in self._suscripciones:
+                self.notificar(coleccion)
+            else:
+                self.notificar_todo()
+            return
+        self.notificar(coleccion, cambio.get("documentKey", {}).get("_id"))
+
+    def _sondear(self):
+        self.modo = "sondeo"
+        vistas = None
+        while not self._detener.is_set():
+            try:
+                versiones = leer_versiones(self.db, self.colecciones)
+                if vistas is None:
+                    self.notificar_todo()
+                else:
+                    for coleccion, version in versiones.items():
+                        if version != vistas.get(coleccion):
+                            self.notificar(coleccion)
+                vistas = versiones
+            except PyMongoError as e:
+                log.warning("Sondeo de versiones: %s", e)
+            self._detener.wait(self.intervalo)
@@ -0,0 +1,115 @@
+"""
+Métricas en formato de exposición de Prometheus.
+
+Con varios workers de gunicorn hay que definir PROMETHEUS_MULTIPROC_DIR
+(un directorio vacío al arrancar) antes de iniciar la aplicación: cada
+proceso escribe sus contadores en archivos de ese directorio y /metrics
+los suma todos. Sin esa variable se usa el registro del propio proceso.
+"""
+
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+    generate_latest, multiprocess
+)
+from pymongo import monitoring
+
+# Secciones con etiqueta propia; el resto de rutas cuentan como "otros"
+SECCIONES = {
+    "artistas", "clientes", "inventario", "ventas", "reportes",
+    "exportar", "buscar", "importar", "api", "login", "logout", "static", "activos", "metrics",
+}
+
+DURACION_REQUEST = Histogram(
+    "tienda_request_duracion_segundos", "Duración de los requests por sección",
+    ["seccion", "metodo"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    "tienda_requests_total", "Requests atendidos por sección y código de estado",
+    ["seccion", "estado"],
+)
+CONSULTAS_CACHE = Counter(
+    "tienda_cache_consultas_total", "Consultas a cachés en memoria",
+    ["cache", "resultado"],
+)
+CHECKOUTS_POOL = Counter(
+    "tienda_mongo_pool_checkouts_total", "Conexiones tomadas del pool de MongoDB",
+    ["resultado"],
+)
+ESPERA_POOL = Histogram(
+    "tienda_mongo_pool_espera_segundos", "Espera para obtener una conexión del pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+INTENTOS_LOGIN = Counter(
+    "tienda_login_intentos_total", "Intentos de inicio de sesión",
+    ["resultado"],
+)
+
+
+def seccion_actual():
+    """Primer segmento de la regla de la ruta (acotado a SECCIONES)"""
+    if request.url_rule is None:
+        return "otros"
+    primero = request.url_rule.rule.strip("/").split("/")[0].split(".")[0]
+    if not primero:
+        return "index"
+    return primero if primero in SECCIONES else "otros"
+
+
+class MedidorPool(monitoring.ConnectionPoolListener):
+    """Cuenta los checkouts del pool y la espera de cada uno"""
+
+    def connection_checked_out(self, event):
+        CHECKOUTS_POOL.labels("ok").inc()
+        if event.duration is not None:
+            ESPERA_POOL.observe(event.duration)
+
+    def connection_check_out_failed(self, event):
+        CHECKOUTS_POOL.labels("fallo").inc()
+        if event.duration is not None:
+            ESPERA_POOL.observe(event.duration)
+
+    # El resto de eventos del pool no se mide
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+def exposicion():
+    """Texto de todas las métricas (sumando procesos en modo multiproceso)"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro)
+
+
+def instalar(app):
+    """Registra la medición de latencia y la ruta /metrics (sin login)"""
+
+    @app.before_request
+    def iniciar_cronometro():
+        g.inicio_metricas = time.perf_counter()
+
+    @app.after_request
+    def observar_request(response):
+        inicio = g.pop("inicio_metricas", None)
+        if inicio is not None:
+            seccion = seccion_actual()
+            DURACION_REQUEST.labels(seccion, request.method).observe(time.perf_counter() - inicio)
+            REQUESTS.labels(seccion, str(response.status_code)).inc()
+        return response
+
+    @app.route("/metrics")
+    def metricas():
+        return Response(exposicion(), content_type=CONTENT_TYPE_LATEST)
@@ -74,6 +74,10 @@ def normalize_venta(form, custom_id=None):
 
 # ========== AUTENTICACIÓN Y ROLES ==========
 
+# Usuarios de demostración: `python usuarios.py demo` (o `python app.py`, el
+# servidor de desarrollo) los guarda en la colección usuarios con la
+# contraseña cifrada. En producción USUARIOS_DEMO queda apagado.
+# El login valida siempre contra MongoDB (ver usuarios.py).
 USUARIOS = {
     "ldaza": {
         "password": "admin123",
@@ -92,6 +96,7 @@ USUARIOS = {
     }
 }
 
+# Roles iniciales de la colección roles
 ROLES = {
     "administrador": {
         "permisos": ["find", "insert", "update", "remove"],
@@ -106,52 +111,3 @@ ROLES = {
         "descripcion": "Lectura e inserción - Puede consultar y crear datos"
     }
 }
-
-def validar_usuario(usuario, password):
-    """
-    Valida credenciales de usuario.
-    
-    Args:
-        usuario: nombre de usuario
-        password: contraseña
-    
-    Returns:
-        dict: Información del usuario si es válido, None si no
-    """
-    if usuario in USUARIOS:
-        if USUARIOS[usuario]["password"] == password:
-            return USUARIOS[usuario]
-    return None
-
-def obtener_rol(usuario):
-    """
-    Obtiene información del rol del usuario.
-    
-    Args:
-        usuario: nombre de usuario
-    
-    Returns:
-        dict: Permisos y descripción del rol
-    """
-    if usuario in USUARIOS:
-        rol = USUARIOS[usuario]["rol"]
-        return ROLES.get(rol, {})
-    return {}
-
-def tiene_permiso(usuario, permiso):
-    """
-    Verifica si un usuario tiene permiso para una acción.
-    
-    Args:
-        usuario: nombre de usuario
-        permiso: permiso a verificar (find, insert, update, remove)
-    
-    Returns:
-        bool: True si tiene permiso, False si no
-    """
-    if usuario not in USUARIOS:
-        return False
-    
-    rol = USUARIOS[usuario]["rol"]
-    permisos = ROLES.get(rol, {}).get("permisos", [])
-    return permiso in permisos
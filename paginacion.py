@@ -0,0 +1,120 @@
+"""
+Paginación por cursor (keyset) para las vistas de listado.
+
+En lugar de usar skip/offset, cada página continúa a partir de la última
+clave de ordenamiento vista más el _id del documento, de modo que el costo
+de cada página es constante sin importar el tamaño de la colección.
+"""
+
+import base64
+import os
+from datetime import datetime
+from bson import ObjectId, json_util
+
+TAMANO_PAGINA = int(os.getenv("PAGE_SIZE", "25"))
+TAMANO_MAXIMO = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Tipos aceptados en un cursor: el token viene del cliente y va a un $match,
+# así que un dict ({"$regex": ...}) o una lista no deben llegar a la consulta
+_ESCALARES = (str, int, float, bool, datetime, ObjectId, type(None))
+
+
+def codificar_cursor(valor, _id):
+    """Codifica (valor de ordenamiento, _id) en un token seguro para URL"""
+    crudo = json_util.dumps([valor, _id]).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(token):
+    """Decodifica un token de cursor, o retorna None si no es válido"""
+    if not token:
+        return None
+    try:
+        relleno = "=" * (-len(token) % 4)
+        crudo = base64.urlsafe_b64decode(token + relleno)
+        valor, _id = json_util.loads(crudo)
+    except Exception:
+        return None
+    if not isinstance(valor, _ESCALARES) or not isinstance(_id, _ESCALARES) or _id is None:
+        return None
+    return valor, _id
+
+
+def tamano_pagina(args, por_defecto=None):
+    """Obtiene el tamaño de página de la query string, acotado al máximo"""
+    por_defecto = por_defecto or TAMANO_PAGINA
+    try:
+        tamano = int(args.get("tamano", por_defecto))
+    except (TypeError, ValueError):
+        tamano = por_defecto
+    return max(1, min(tamano, TAMANO_MAXIMO))
+
+
+def filtro_keyset(campo, orden, valor, _id):
+    """Filtro para continuar después de (valor, _id) en el orden indicado"""
+    op = "$gt" if orden == 1 else "$lt"
+    return {
+        "$or": [
+            {campo: {op: valor}},
+            {campo: valor, "_id": {op: _id}},
+        ]
+    }
+
+
+def paginar(coleccion, campo, orden=1, args=None, filtro=None, pipeline=None, tamano=None):
+    """
+    Obtiene una página de documentos ordenados por (campo, _id).
+
+    Args:
+        coleccion: colección MongoDB a consultar
+        campo: campo de ordenamiento (ej. "nombre", "fecha_venta")
+        orden: 1 ascendente, -1 descendente
+        args: query string con los cursores "despues" / "antes" y "tamano"
+        filtro: filtro adicional aplicado antes de paginar
+        pipeline: etapas extra ($lookup, $project...) aplicadas solo a la página
+        tamano: tamaño de página (por defecto PAGE_SIZE)
+
+    Returns:
+        dict: items, cursores "siguiente" / "anterior" y tamaño de la página
+    """
+    args = args or {}
+    tamano = tamano or tamano_pagina(args)
+    despues = decodificar_cursor(args.get("despues"))
+    antes = decodificar_cursor(args.get("antes"))
+
+    # Para retroceder se consulta en orden inverso y luego se invierte la página
+    hacia_atras = antes is not None and despues is None
+    cursor = antes if hacia_atras else despues
+    orden_consulta = -orden if hacia_atras else orden
+
+    match = dict(filtro or {})
+    if cursor:
+        keyset = filtro_keyset(campo, orden_consulta, *cursor)
+        match = {"$and": [match, keyset]} if match else keyset
+
+    etapas = [
+        {"$match": match},
+        {"$sort": {campo: orden_consulta, "_id": orden_consulta}},
+        {"$limit": tamano + 1},
+    ]
+    docs = list(coleccion.aggregate(etapas + list(pipeline or [])))
+
+    hay_mas = len(docs) > tamano
+    docs = docs[:tamano]
+    if hacia_atras:
+        docs.reverse()
+
+    siguiente = anterior = None
+    if docs:
+        primero, ultimo = docs[0], docs[-1]
+        if (hay_mas and not hacia_atras) or (hacia_atras and cursor):
+            siguiente = codificar_cursor(ultimo.get(campo), ultimo["_id"])
+        if (hay_mas and hacia_atras) or (not hacia_atras and cursor):
+            anterior = codificar_cursor(primero.get(campo), primero["_id"])
+
+    return {
+        "items": docs,
+        "siguiente": siguiente,
+        "anterior": anterior,
+        "tamano": tamano,
+    }
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Paquete de reportes: los cinco reportes del índice en paralelo.
+
+Cada reporte se ejecuta en un pool de hilos acotado (PAQUETE_WORKERS) que
+usa el mismo MongoClient, y por lo tanto el mismo pool de conexiones, que
+el resto de la aplicación. El tiempo total se acerca al del reporte más
+lento en lugar de la suma de los cinco. Igual que en las páginas de cada
+reporte, se usa la última instantánea si existe, salvo con fresco=True.
+
+Uso:
+    python paquete_reportes.py                      # resumen de tiempos
+    python paquete_reportes.py --salida paquete.zip --fresco
+"""
+
+import argparse
+import contextvars
+import io
+import logging
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dotenv import load_dotenv
+from conexion import base_reportes, crear_cliente
+from exportar import COLUMNAS, filas_csv
+from instantaneas import PIPELINES, leer_instantanea
+
+# Reportes del paquete, en el orden del índice de reportes
+PAQUETE = ["estadisticas", "ventas_por_artista", "inventario_bajo", "clientes_activos", "generos_populares"]
+
+ESPERA_MAXIMA = int(os.getenv("PAQUETE_TIMEOUT", "120"))
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("PAQUETE_WORKERS", str(len(PAQUETE)))),
+                           thread_name_prefix="paquete")
+
+log = logging.getLogger(__name__)
+
+
+def recurso(nombre):
+    """Nombre del reporte en las exportaciones (ventas_por_artista -> ventas-por-artista)"""
+    return nombre.replace("_", "-")
+
+
+def _ejecutar(db, nombre, fresco):
+    """Tarea del pool: filas de un reporte (instantánea o agregación en vivo)"""
+    inicio = time.perf_counter()
+    resultado = {"filas": [], "generado": None, "error": None}
+    try:
+        instantanea = None if fresco else leer_instantanea(db, nombre)
+        if instantanea is not None:
+            resultado["filas"], resultado["generado"] = list(instantanea["filas"]), instantanea["generado"]
+        else:
+            coleccion, pipeline = PIPELINES[nombre]
+            resultado["filas"] = list(db[coleccion].aggregate(pipeline()))
+    except Exception as e:
+        # Cualquier falla (datos inesperados, no solo de MongoDB) queda en su reporte
+        log.warning("Paquete de reportes: %s falló: %s", nombre, e)
+        resultado["error"] = str(e) or type(e).__name__
+    resultado["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    return resultado
+
+
+def ejecutar_paquete(db, nombres=PAQUETE, fresco=False):
+    """
+    Ejecuta los reportes en paralelo; un reporte con error no detiene al resto.
+
+    Args:
+        db: base de datos de reportes (no un LocalProxy: se usa desde otros hilos)
+        nombres: reportes a ejecutar (claves de instantaneas.PIPELINES)
+        fresco: ignorar las instantáneas y agregar en vivo
+
+    Returns:
+        dict: reportes {nombre: filas, generado, error, duracion_ms} y duración total
+    """
+    inicio = time.perf_counter()
+    # Cada tarea hereda el contexto (medición de comandos para Server-Timing)
+    futuros = {
+        nombre: _pool.submit(contextvars.copy_context().run, _ejecutar, db, nombre, fresco)
+        for nombre in nombres
+    }
+    limite = time.monotonic() + ESPERA_MAXIMA
+    reportes = {}
+    for nombre, futuro in futuros.items():
+        try:
+            reportes[nombre] = futuro.result(timeout=max(0, limite - time.monotonic()))
+        except TimeoutError:
+            reportes[nombre] = {"filas": [], "generado": None, "error": "Tiempo de espera agotado",
+                                "duracion_ms": ESPERA_MAXIMA * 1000}
+    return {
+        "reportes": reportes,
+        "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "suma_ms": round(sum(r["duracion_ms"] for r in reportes.values()), 1),
+    }
+
+
+def archivo_paquete(paquete):
+    """ZIP con un CSV por reporte (mismas columnas que las exportaciones)"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, reporte in paquete["reportes"].items():
+            if reporte["error"]:
+                continue
+            contenido = "".join(filas_csv(reporte["filas"], COLUMNAS[recurso(nombre)]))
+            archivo.writestr(f"{recurso(nombre)}.csv", contenido)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta los reportes del índice en paralelo")
+    parser.add_argument("--salida", help="archivo .zip con un CSV por reporte")
+    parser.add_argument("--fresco", action="store_true", help="ignorar las instantáneas")
+    opciones = parser.parse_args()
+
+    load_dotenv()
+    db = base_reportes(crear_cliente())
+    paquete = ejecutar_paquete(db, fresco=opciones.fresco)
+
+    for nombre, reporte in paquete["reportes"].items():
+        estado = f"error: {reporte['error']}" if reporte["error"] else f"{len(reporte['filas'])} filas"
+        origen = "instantánea" if reporte["generado"] else "en vivo"
+        print(f"  {nombre:<22} {reporte['duracion_ms']:>9.1f} ms  {origen:<12} {estado}")
+    print(f"✓ Total {paquete['duracion_ms']:.1f} ms (suma de reportes {paquete['suma_ms']:.1f} ms)")
+
+    if opciones.salida:
+        with open(opciones.salida, "wb") as f:
+            f.write(archivo_paquete(paquete))
+        print(f"✓ Paquete en {opciones.salida}")
+    return 1 if any(r["error"] for r in paquete["reportes"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
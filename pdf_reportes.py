@@ -0,0 +1,182 @@
+"""
+Generación de PDF de los reportes con fpdf2 (Python puro).
+
+El PDF se genera en un pool de hilos y se guarda en disco con un nombre
+derivado del contenido del reporte (sha256 de sus filas y de la fecha
+impresa). Si los datos no cambiaron en el día, la descarga se sirve
+directamente desde el archivo ya generado.
+
+El directorio se poda después de cada generación: se borran los archivos
+sin usar hace más de PDF_CACHE_DIAS días y, si aún quedan más de
+PDF_CACHE_MAX, los usados hace más tiempo.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from bson import json_util
+from fpdf import FPDF
+from exportar import valor_exportable
+
+DIRECTORIO = os.getenv("PDF_CACHE_DIR", "cache_pdf")
+ESPERA_MAXIMA = int(os.getenv("PDF_TIMEOUT", "60"))
+MAXIMO_ARCHIVOS = int(os.getenv("PDF_CACHE_MAX", "200"))
+EDAD_MAXIMA = float(os.getenv("PDF_CACHE_DIAS", "7")) * 86400
+# Un archivo usado hace menos de esto no se borra (puede estar por enviarse)
+EDAD_MINIMA = 60
+
+TITULOS = {
+    "estadisticas": "Estadísticas Generales",
+    "ventas-por-artista": "Ventas por Artista",
+    "inventario-bajo": "Reporte de Inventario Bajo",
+    "clientes-activos": "Clientes Más Activos",
+    "generos-populares": "Géneros Populares",
+    "ventas-por-periodo": "Ventas por Período",
+}
+
+# Fila de total al pie de la tabla: (etiqueta, columna a sumar)
+TOTALES = {
+    "ventas-por-artista": ("Ingresos totales", "ingresos"),
+    "inventario-bajo": ("Valor Total en Inventario Bajo", "valor_total"),
+    "clientes-activos": ("Gasto total", "gasto_total"),
+    "ventas-por-periodo": ("Ingresos totales", "ingresos"),
+}
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("PDF_WORKERS", "2")),
+                           thread_name_prefix="pdf")
+_en_curso = {}
+_lock = threading.Lock()
+
+log = logging.getLogger(__name__)
+
+
+def clave_reporte(recurso, columnas, filas, fecha):
+    """Huella del contenido del reporte: mismo contenido y fecha, mismo archivo"""
+    datos = json_util.dumps(
+        {"recurso": recurso, "columnas": columnas, "fecha": fecha,
+         "filas": [[f.get(c) for c in columnas] for f in filas]},
+        sort_keys=True,
+    )
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+def texto_pdf(valor):
+    """Texto de una celda; las fuentes base de PDF solo admiten latin-1"""
+    valor = valor_exportable(valor)
+    if isinstance(valor, float):
+        valor = f"{valor:.2f}"
+    texto = "" if valor is None else str(valor)
+    return texto.encode("latin-1", "replace").decode("latin-1")
+
+
+def renderizar_pdf(recurso, columnas, filas, fecha):
+    """Dibuja el reporte como tabla y retorna los bytes del PDF"""
+    pdf = FPDF(orientation="L" if len(columnas) > 5 else "P")
+    pdf.set_title(texto_pdf(TITULOS[recurso]))
+    pdf.add_page()
+
+    pdf.set_font("helvetica", "B", 16)
+    pdf.set_text_color(220, 53, 69)
+    pdf.cell(0, 10, texto_pdf(TITULOS[recurso]), align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(85, 85, 85)
+    pdf.set_font("helvetica", "", 9)
+    pdf.cell(0, 8, texto_pdf(f"Fecha del reporte: {fecha}"), new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(2)
+
+    pdf.set_text_color(0, 0, 0)
+    with pdf.table(text_align="LEFT", line_height=6) as tabla:
+        encabezado = tabla.row()
+        for columna in columnas:
+            encabezado.cell(texto_pdf(columna.replace("_", " ").capitalize()))
+        for fila in filas:
+            celdas = tabla.row()
+            for columna in columnas:
+                celdas.cell(texto_pdf(fila.get(columna)))
+
+    if recurso in TOTALES:
+        etiqueta, columna = TOTALES[recurso]
+        total = sum(f.get(columna) or 0 for f in filas)
+        pdf.ln(4)
+        pdf.set_font("helvetica", "B", 10)
+        pdf.cell(0, 8, texto_pdf(f"{etiqueta}: ${total:.2f}"), align="R")
+
+    pdf.set_y(-15)
+    pdf.set_font("helvetica", "", 8)
+    pdf.set_text_color(136, 136, 136)
+    pdf.cell(0, 8, texto_pdf("Música Vintage - Reporte generado automáticamente."), align="C")
+    return bytes(pdf.output())
+
+
+def podar_cache(directorio=DIRECTORIO, maximo=MAXIMO_ARCHIVOS, edad_maxima=EDAD_MAXIMA):
+    """
+    Borra los PDF sin usar hace más de edad_maxima segundos y, si quedan más
+    de `maximo`, los de uso más antiguo (la fecha de modificación es la del
+    último uso).
+
+    Returns:
+        int: archivos borrados
+    """
+    ahora = time.time()
+    archivos = []
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            if entrada.is_file() and entrada.name.endswith(".pdf"):
+                archivos.append((entrada.stat().st_mtime, entrada.path))
+    archivos.sort(reverse=True)
+    borrados = 0
+    for posicion, (usado, ruta) in enumerate(archivos):
+        if ahora - usado < EDAD_MINIMA:
+            continue
+        if posicion >= maximo or ahora - usado > edad_maxima:
+            try:
+                os.remove(ruta)
+                borrados += 1
+            except FileNotFoundError:
+                pass
+    return borrados
+
+
+def _generar(ruta, recurso, columnas, filas, fecha):
+    """Tarea del pool: renderiza y escribe el archivo de forma atómica"""
+    contenido = renderizar_pdf(recurso, columnas, filas, fecha)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.{threading.get_ident()}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+    try:
+        podar_cache(os.path.dirname(ruta))
+    except OSError as e:
+        log.warning("No se pudo podar la caché de PDF: %s", e)
+    return ruta
+
+
+def obtener_pdf(recurso, columnas, filas):
+    """
+    Ruta del PDF del reporte, generándolo en el pool si no está en disco.
+
+    Varias solicitudes simultáneas del mismo contenido comparten una sola
+    generación. La fecha impresa es la del día de la descarga y forma parte
+    de la clave, así un PDF de ayer no se sirve con la fecha de ayer.
+    """
+    fecha = date.today().isoformat()
+    clave = clave_reporte(recurso, columnas, filas, fecha)
+    ruta = os.path.abspath(os.path.join(DIRECTORIO, f"{recurso}-{clave}.pdf"))
+    try:
+        # Marca el uso: la poda borra primero los usados hace más tiempo
+        os.utime(ruta)
+        return ruta
+    except FileNotFoundError:
+        pass
+
+    with _lock:
+        futuro = _en_curso.get(clave)
+        if futuro is None:
+            futuro = _pool.submit(_generar, ruta, recurso, columnas, filas, fecha)
+            _en_curso[clave] = futuro
+            futuro.add_done_callback(lambda _: _en_curso.pop(clave, None))
+    return futuro.result(timeout=ESPERA_MAXIMA)
@@ -0,0 +1,190 @@
+"""
+Registro atómico de ventas.
+
+El descuento de stock, la inserción de la venta y la actualización de los
+resúmenes se ejecutan en una sola transacción. El stock se descuenta con un
+find_one_and_update condicional (stock >= cantidad), así dos ventas
+simultáneas del último disco no pueden dejar el stock negativo. Editar o
+eliminar una venta devuelve su stock en la misma transacción que corrige
+los resúmenes.
+"""
+
+from collections import defaultdict
+from pymongo import ReadPreference, ReturnDocument, UpdateOne
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from resumenes import aplicar_venta, aplicar_ventas
+
+
+class StockInsuficiente(Exception):
+    """No hay stock suficiente (o no existe el producto) para la venta"""
+
+
+class CantidadInvalida(ValueError):
+    """La cantidad de una venta debe ser al menos 1"""
+
+
+def validar_cantidad(doc):
+    """Rechaza cantidades menores que 1: con una negativa el descuento sumaría stock"""
+    cantidad = doc.get("cantidad")
+    if not isinstance(cantidad, int) or cantidad < 1:
+        raise CantidadInvalida(f"La cantidad debe ser al menos 1 (se recibió {cantidad})")
+
+
+def _descontar_stock(db, doc, session):
+    producto = db["inventario"].find_one_and_update(
+        {
+            "artista_id": doc["artista_id"],
+            "album": doc["album"],
+            "stock": {"$gte": doc["cantidad"]},
+        },
+        {"$inc": {"stock": -doc["cantidad"]}},
+        session=session,
+    )
+    if producto is None:
+        raise StockInsuficiente(
+            f"Stock insuficiente para '{doc['album']}' (se pidieron {doc['cantidad']})"
+        )
+    return producto
+
+
+def _devolver_stock(db, venta, session):
+    """Repone el stock de una venta anterior (si su producto aún existe)"""
+    if (venta.get("cantidad") or 0) > 0:
+        db["inventario"].update_one(
+            {"artista_id": venta.get("artista_id"), "album": venta.get("album")},
+            {"$inc": {"stock": venta["cantidad"]}},
+            session=session,
+        )
+
+
+def _en_transaccion(client, funcion):
+    with client.start_session() as session:
+        return session.with_transaction(
+            funcion,
+            read_concern=ReadConcern("snapshot"),
+            write_concern=WriteConcern("majority"),
+            read_preference=ReadPreference.PRIMARY,
+        )
+
+
+def registrar_venta(client, db, doc):
+    """
+    Descuenta stock y registra la venta en una transacción.
+
+    with_transaction reintenta automáticamente ante TransientTransactionError
+    y UnknownTransactionCommitResult; StockInsuficiente aborta sin reintentar.
+
+    Args:
+        client: MongoClient (debe apuntar a un replica set o cluster Atlas)
+        db: base de datos de la tienda
+        doc: venta normalizada (normalize_venta) con fecha_venta ya parseada
+
+    Returns:
+        dict: producto de inventario antes del descuento
+
+    Raises:
+        CantidadInvalida: si la cantidad es menor que 1
+    """
+    validar_cantidad(doc)
+
+    def _transaccion(session):
+        producto = _descontar_stock(db, doc, session)
+        db["ventas"].insert_one(doc, session=session)
+        aplicar_venta(db, doc, session=session)
+        return producto
+
+    return _en_transaccion(client, _transaccion)
+
+
+def modificar_venta(client, db, _id, doc):
+    """
+    Reemplaza los campos de una venta en una transacción: devuelve el stock
+    de la versión anterior, descuenta el de la nueva y corrige los resúmenes.
+
+    Returns:
+        dict: la venta anterior, o None si no existe
+    """
+    validar_cantidad(doc)
+
+    def _transaccion(session):
+        anterior = db["ventas"].find_one_and_update(
+            {"_id": _id}, {"$set": doc},
+            return_document=ReturnDocument.BEFORE, session=session,
+        )
+        if anterior is None:
+            return None
+        _devolver_stock(db, anterior, session)
+        _descontar_stock(db, doc, session)
+        aplicar_venta(db, anterior, -1, session=session)
+        aplicar_venta(db, doc, session=session)
+        return anterior
+
+    return _en_transaccion(client, _transaccion)
+
+
+def eliminar_venta(client, db, _id):
+    """
+    Elimina una venta, devuelve su stock y la resta de los resúmenes.
+
+    Returns:
+        dict: la venta eliminada, o None si no existe
+    """
+    def _transaccion(session):
+        anterior = db["ventas"].find_one_and_delete({"_id": _id}, session=session)
+        if anterior is not None:
+            _devolver_stock(db, anterior, session)
+            aplicar_venta(db, anterior, -1, session=session)
+        return anterior
+
+    return _en_transaccion(client, _transaccion)
+
+
+def registrar_ventas(client, db, docs):
+    """
+    Registra un lote de ventas en una sola transacción.
+
+    El stock se descuenta con un bulk_write (un $inc por producto con el total
+    del lote), las ventas se insertan con insert_many y los resúmenes se
+    actualizan con aplicar_ventas. Si algún producto no alcanza, el lote
+    completo se aborta con StockInsuficiente.
+
+    Returns:
+        list: _id de los productos de inventario descontados
+    """
+    for doc in docs:
+        validar_cantidad(doc)
+    totales = defaultdict(int)
+    for doc in docs:
+        totales[(doc["artista_id"], doc["album"])] += doc["cantidad"]
+    claves = list(totales)
+
+    def _transaccion(session):
+        productos = {
+            (p["artista_id"], p["album"]): p
+            for p in db["inventario"].find(
+                {"$or": [{"artista_id": a, "album": al} for a, al in claves]},
+                {"artista_id": 1, "album": 1, "stock": 1}, session=session,
+            )
+        }
+        faltantes = [
+            f"'{album}' (se pidieron {totales[(a, album)]})" for a, album in claves
+            if (a, album) not in productos or productos[(a, album)].get("stock", 0) < totales[(a, album)]
+        ]
+        if faltantes:
+            raise StockInsuficiente("Stock insuficiente para " + ", ".join(faltantes))
+
+        resultado = db["inventario"].bulk_write([
+            UpdateOne(
+                {"_id": productos[clave]["_id"], "stock": {"$gte": totales[clave]}},
+                {"$inc": {"stock": -totales[clave]}},
+            )
+            for clave in claves
+        ], ordered=False, session=session)
+        if resultado.matched_count < len(claves):
+            raise StockInsuficiente("El stock cambió mientras se registraba el lote")
+        db["ventas"].insert_many(docs, session=session)
+        aplicar_ventas(db, docs, session=session)
+        return [productos[clave]["_id"] for clave in claves]
+
+    return _en_transaccion(client, _transaccion)
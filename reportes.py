@@ -0,0 +1,289 @@
+"""
+Pipelines de agregación de los reportes.
+
+Se definen fuera de las rutas para poder reutilizarlos desde las vistas,
+las herramientas de línea de comandos (explain de índices) y los reportes
+programados.
+"""
+
+from datetime import date, datetime, timedelta
+from resumenes import RESUMEN_ARTISTAS, RESUMEN_CLIENTES
+
+UNIDADES_PERIODO = ["day", "week", "month"]
+
+def _solo_fecha(valor):
+    """True si el valor ISO no trae hora (2024-05-31, 20240531)"""
+    try:
+        date.fromisoformat(valor)
+        return True
+    except ValueError:
+        return False
+
+
+def rango_fechas(args):
+    """
+    Obtiene (desde, hasta) de la query string.
+
+    Las fechas van en formato ISO (YYYY-MM-DD); si hasta es solo una fecha
+    se incluye el día completo. Valores ausentes o inválidos son None.
+    """
+    def _fecha(nombre):
+        valor = (args.get(nombre) or "").strip()
+        if not valor:
+            return None
+        try:
+            fecha = datetime.fromisoformat(valor)
+        except ValueError:
+            return None
+        if nombre == "hasta" and _solo_fecha(valor):
+            fecha += timedelta(days=1)
+        return fecha
+
+    return _fecha("desde"), _fecha("hasta")
+
+def match_ventas(desde=None, hasta=None):
+    """$match inicial sobre fecha_venta (indexado) y cantidad > 0"""
+    filtro = {}
+    if desde or hasta:
+        filtro["fecha_venta"] = {}
+        if desde:
+            filtro["fecha_venta"]["$gte"] = desde
+        if hasta:
+            filtro["fecha_venta"]["$lt"] = hasta
+    filtro["cantidad"] = {"$gt": 0}
+    return {"$match": filtro}
+
+
+def pipeline_inventario_detalle():
+    """Nombre del artista de cada producto (copiado en el documento, ver denormalizacion.py)"""
+    return [
+        { "$addFields": { "nombre_artista": { "$ifNull": ["$nombre_artista", "N/A"] } } }
+    ]
+
+def pipeline_ventas_detalle():
+    """Nombres de cliente y artista (copiados en la venta) y total de cada venta"""
+    return [
+        {
+            "$project": {
+                "_id": 1,
+                "fecha_venta": 1,
+                "album": 1,
+                "cantidad": 1,
+                "precio_unitario": 1,
+                "nombre_cliente": { "$ifNull": ["$nombre_cliente", "N/A"] },
+                "nombre_artista": { "$ifNull": ["$nombre_artista", "N/A"] },
+                "total_venta": { "$multiply": ["$cantidad", "$precio_unitario"] }
+            }
+        }
+    ]
+
+def pipeline_estadisticas():
+    """
+    Totales generales en una sola agregación sobre ventas.
+
+    Cada $unionWith agrega una fila con los totales de otra colección y el
+    $group final las combina, así el tablero cuesta un solo viaje al servidor.
+    """
+    return [
+        {
+            "$group": {
+                "_id": None,
+                "total_ventas": {"$sum": 1},
+                "ingresos_totales": {"$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}}
+            }
+        },
+        {
+            "$unionWith": {
+                "coll": "inventario",
+                "pipeline": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "total_productos": {"$sum": 1},
+                            "stock_total": {"$sum": "$stock"}
+                        }
+                    }
+                ]
+            }
+        },
+        {"$unionWith": {"coll": "artistas", "pipeline": [{"$count": "total_artistas"}]}},
+        {"$unionWith": {"coll": "clientes", "pipeline": [{"$count": "total_clientes"}]}},
+        {
+            "$group": {
+                "_id": None,
+                "total_artistas": {"$max": "$total_artistas"},
+                "total_clientes": {"$max": "$total_clientes"},
+                "total_productos": {"$max": "$total_productos"},
+                "total_ventas": {"$max": "$total_ventas"},
+                "ingresos_totales": {"$max": "$ingresos_totales"},
+                "stock_total": {"$max": "$stock_total"}
+            }
+        }
+    ]
+
+def pipeline_ventas_por_artista():
+    """Ventas por artista: unidades, ingresos y transacciones (sobre el resumen)"""
+    return [
+        {
+            "$sort": {"ingresos": -1}
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "artista": {"$ifNull": ["$nombre", "Desconocido"]},
+                "unidades": 1,
+                "ingresos": {"$round": ["$ingresos", 2]},
+                "transacciones": 1
+            }
+        }
+    ]
+
+def pipeline_ventas_por_artista_periodo(desde=None, hasta=None):
+    """Ventas por artista en un rango de fechas, agrupando sobre ventas"""
+    return [
+        match_ventas(desde, hasta),
+        {
+            "$group": {
+                "_id": "$artista_id",
+                "nombre": {"$last": "$nombre_artista"},
+                "unidades": {"$sum": "$cantidad"},
+                "ingresos": {"$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}},
+                "transacciones": {"$sum": 1}
+            }
+        }
+    ] + pipeline_ventas_por_artista()
+
+def pipeline_inventario_bajo():
+    """Productos con stock menor a 5 unidades"""
+    return [
+        {
+            "$match": {
+                "stock": {"$lt": 5}
+            }
+        },
+        {
+            "$project": {
+                "_id": 1,
+                "nombre": "$album",
+                "stock": 1,
+                "precio_unitario": 1,
+                "valor_total": {"$multiply": ["$stock", "$precio_unitario"]},
+                "artista_nombre": {"$ifNull": ["$nombre_artista", "N/A"]}
+            }
+        },
+        {
+            "$sort": {"stock": 1}
+        }
+    ]
+
+def pipeline_clientes_activos():
+    """Clientes ordenados por gasto total (sobre el resumen)"""
+    return [
+        {
+            "$sort": {"gasto_total": -1}
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "cliente_id": "$_id",
+                "cliente_nombre": {"$ifNull": ["$nombre", "Desconocido"]},
+                "compras": 1,
+                "cantidad_articulos": 1,
+                "gasto_total": {"$round": ["$gasto_total", 2]}
+            }
+        }
+    ]
+
+def pipeline_clientes_activos_periodo(desde=None, hasta=None):
+    """Clientes más activos en un rango de fechas, agrupando sobre ventas"""
+    return [
+        match_ventas(desde, hasta),
+        {
+            "$group": {
+                "_id": "$cliente_id",
+                "nombre": {"$last": "$nombre_cliente"},
+                "compras": {"$sum": 1},
+                "cantidad_articulos": {"$sum": "$cantidad"},
+                "gasto_total": {"$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}}
+            }
+        }
+    ] + pipeline_clientes_activos()
+
+def pipeline_ventas_por_periodo(unidad="month", desde=None, hasta=None):
+    """Serie de tiempo de ventas agrupada por día, semana o mes ($dateTrunc)"""
+    truncar = {"date": "$fecha_venta", "unit": unidad}
+    if unidad == "week":
+        truncar["startOfWeek"] = "monday"
+    return [
+        match_ventas(desde, hasta),
+        {
+            "$group": {
+                "_id": {"$dateTrunc": truncar},
+                "transacciones": {"$sum": 1},
+                "unidades": {"$sum": "$cantidad"},
+                "ingresos": {"$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "periodo": "$_id",
+                "transacciones": 1,
+                "unidades": 1,
+                "ingresos": {"$round": ["$ingresos", 2]}
+            }
+        },
+        {
+            "$sort": {"periodo": 1}
+        }
+    ]
+
+def pipeline_generos_populares():
+    """Stock y valor del inventario agrupado por género"""
+    return [
+        {
+            "$match": {
+                "genero": {"$nin": [None, ""]}
+            }
+        },
+        {
+            "$group": {
+                "_id": "$genero",
+                "cantidad_productos": {"$sum": 1},
+                "stock_disponible": {"$sum": "$stock"},
+                "valor_total": {
+                    "$sum": {"$multiply": ["$stock", "$precio_unitario"]}
+                }
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "genero": "$_id",
+                "cantidad_productos": 1,
+                "stock_disponible": 1,
+                "valor_total": {"$round": ["$valor_total", 2]},
+                "valor_promedio": {
+                    "$round": [
+                        {"$divide": ["$valor_total", "$cantidad_productos"]},
+                        2
+                    ]
+                }
+            }
+        },
+        {
+            "$sort": {"valor_total": -1}
+        }
+    ]
+
+
+# Reportes con su colección de origen, usados por las herramientas de diagnóstico
+REPORTES = {
+    "ventas_por_artista": (RESUMEN_ARTISTAS, pipeline_ventas_por_artista),
+    "inventario_bajo": ("inventario", pipeline_inventario_bajo),
+    "clientes_activos": (RESUMEN_CLIENTES, pipeline_clientes_activos),
+    "generos_populares": ("inventario", pipeline_generos_populares),
+    "ventas_por_periodo": (
+        "ventas", lambda: pipeline_ventas_por_periodo("month", datetime.now() - timedelta(days=365))
+    ),
+}
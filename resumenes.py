@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Resúmenes materializados de ventas por artista y por cliente.
+
+Cada alta, edición o baja de una venta aplica deltas con $inc sobre un
+documento por artista y otro por cliente, de modo que los reportes leen
+tantos documentos como artistas o clientes haya, no como ventas.
+
+Uso:
+    python resumenes.py    # recalcula los resúmenes desde cero
+"""
+
+import sys
+from collections import defaultdict
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from conexion import base_datos, crear_cliente
+
+RESUMEN_ARTISTAS = "resumen_ventas_artistas"
+RESUMEN_CLIENTES = "resumen_ventas_clientes"
+
+
+def _nombre(nombre):
+    """$set del nombre copiado en el resumen (ver denormalizacion.py), si se conoce"""
+    return {"$set": {"nombre": nombre}} if nombre else {}
+
+
+def aplicar_venta(db, venta, signo=1, session=None):
+    """
+    Suma (signo=1) o resta (signo=-1) una venta de los resúmenes.
+
+    Igual que los reportes originales, solo cuentan ventas con cantidad > 0.
+    """
+    if not venta:
+        return
+    cantidad = venta.get("cantidad") or 0
+    if cantidad <= 0:
+        return
+    ingresos = cantidad * (venta.get("precio_unitario") or 0)
+
+    db[RESUMEN_ARTISTAS].update_one(
+        {"_id": venta.get("artista_id")},
+        {"$inc": {
+            "unidades": signo * cantidad,
+            "ingresos": signo * ingresos,
+            "transacciones": signo,
+        }, **_nombre(venta.get("nombre_artista"))},
+        upsert=True,
+        session=session,
+    )
+    db[RESUMEN_CLIENTES].update_one(
+        {"_id": venta.get("cliente_id")},
+        {"$inc": {
+            "cantidad_articulos": signo * cantidad,
+            "gasto_total": signo * ingresos,
+            "compras": signo,
+        }, **_nombre(venta.get("nombre_cliente"))},
+        upsert=True,
+        session=session,
+    )
+
+    if signo < 0:
+        # Un artista o cliente sin ventas no debe aparecer en los reportes
+        db[RESUMEN_ARTISTAS].delete_one(
+            {"_id": venta.get("artista_id"), "transacciones": {"$lte": 0}}, session=session
+        )
+        db[RESUMEN_CLIENTES].delete_one(
+            {"_id": venta.get("cliente_id"), "compras": {"$lte": 0}}, session=session
+        )
+
+
+def aplicar_ventas(db, ventas, session=None):
+    """
+    Suma un lote de ventas nuevas a los resúmenes con un bulk_write por
+    resumen (un $inc acumulado por artista y por cliente).
+    """
+    artistas = defaultdict(lambda: [0, 0, 0, None])
+    clientes = defaultdict(lambda: [0, 0, 0, None])
+    for venta in ventas:
+        cantidad = venta.get("cantidad") or 0
+        if cantidad <= 0:
+            continue
+        ingresos = cantidad * (venta.get("precio_unitario") or 0)
+        for acumulado, clave, nombre in (
+            (artistas, venta.get("artista_id"), venta.get("nombre_artista")),
+            (clientes, venta.get("cliente_id"), venta.get("nombre_cliente")),
+        ):
+            acumulado[clave][0] += cantidad
+            acumulado[clave][1] += ingresos
+            acumulado[clave][2] += 1
+            acumulado[clave][3] = nombre or acumulado[clave][3]
+
+    if artistas:
+        db[RESUMEN_ARTISTAS].bulk_write([
+            UpdateOne({"_id": _id}, {"$inc": {
+                "unidades": u, "ingresos": i, "transacciones": t,
+            }, **_nombre(n)}, upsert=True)
+            for _id, (u, i, t, n) in artistas.items()
+        ], ordered=False, session=session)
+    if clientes:
+        db[RESUMEN_CLIENTES].bulk_write([
+            UpdateOne({"_id": _id}, {"$inc": {
+                "cantidad_articulos": u, "gasto_total": i, "compras": t,
+            }, **_nombre(n)}, upsert=True)
+            for _id, (u, i, t, n) in clientes.items()
+        ], ordered=False, session=session)
+
+
+def reconstruir_resumenes(db):
+    """Recalcula ambos resúmenes a partir de todas las ventas ($group + $out)"""
+    db["ventas"].aggregate([
+        {"$match": {"cantidad": {"$gt": 0}}},
+        {
+            "$group": {
+                "_id": "$artista_id",
+                "nombre": {"$last": "$nombre_artista"},
+                "unidades": {"$sum": "$cantidad"},
+                "ingresos": {"$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}},
+                "transacciones": {"$sum": 1}
+            }
+        },
+        {"$out": RESUMEN_ARTISTAS}
+    ])
+    db["ventas"].aggregate([
+        {"$match": {"cantidad": {"$gt": 0}}},
+        {
+            "$group": {
+                "_id": "$cliente_id",
+                "nombre": {"$last": "$nombre_cliente"},
+                "cantidad_articulos": {"$sum": "$cantidad"},
+                "gasto_total": {"$sum": {"$multiply": ["$cantidad", "$precio_unitario"]}},
+                "compras": {"$sum": 1}
+            }
+        },
+        {"$out": RESUMEN_CLIENTES}
+    ])
+    return {
+        RESUMEN_ARTISTAS: db[RESUMEN_ARTISTAS].count_documents({}),
+        RESUMEN_CLIENTES: db[RESUMEN_CLIENTES].count_documents({}),
+    }
+
+
+def main():
+    load_dotenv()
+    db = base_datos(crear_cliente())
+
+    for nombre, total in reconstruir_resumenes(db).items():
+        print(f"✓ {nombre}: {total} documentos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
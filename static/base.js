@@ -0,0 +1,18 @@
+// Seguridad: Desactivar acceso a herramientas de desarrollo en producción
+// (Comentar en desarrollo)
+// document.addEventListener('keydown', function(e) {
+//   if (e.key === 'F12' || (e.ctrlKey && e.shiftKey && e.key === 'I')) {
+//     e.preventDefault();
+//   }
+// });
+
+// Auto-cerrar alertas después de 5 segundos
+document.addEventListener('DOMContentLoaded', function() {
+  const alerts = document.querySelectorAll('.alert');
+  alerts.forEach(function(alert) {
+    setTimeout(function() {
+      const bsAlert = new bootstrap.Alert(alert);
+      bsAlert.close();
+    }, 5000);
+  });
+});
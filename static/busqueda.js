@@ -0,0 +1,59 @@
+// Búsqueda por prefijo (type-ahead) para los campos con data-buscar.
+// Cada campo consulta su endpoint JSON, llena su <datalist> y, al elegir
+// una opción, copia el _id en el campo oculto indicado por data-destino.
+(function() {
+  const ESPERA_MS = 200;
+
+  function opcionElegida(input) {
+    const lista = document.getElementById(input.getAttribute('list'));
+    return Array.from(lista.options).find(function(o) { return o.value === input.value; });
+  }
+
+  function configurar(input) {
+    const lista = document.getElementById(input.getAttribute('list'));
+    const campo = input.dataset.campo;
+    let temporizador = null;
+
+    input.addEventListener('input', function() {
+      clearTimeout(temporizador);
+      temporizador = setTimeout(function() {
+        const params = new URLSearchParams({ q: input.value });
+        if (input.dataset.filtro) {
+          const filtro = document.getElementById(input.dataset.filtro);
+          if (filtro && filtro.value) {
+            params.set(input.dataset.filtro, filtro.value);
+          }
+        }
+        fetch(input.dataset.buscar + '?' + params.toString(), { credentials: 'same-origin' })
+          .then(function(r) { return r.ok ? r.json() : []; })
+          .then(function(docs) {
+            lista.innerHTML = '';
+            docs.forEach(function(doc) {
+              const opcion = document.createElement('option');
+              opcion.value = doc[campo];
+              opcion.dataset.id = doc._id;
+              if (doc.precio_unitario !== undefined) {
+                opcion.dataset.precio = doc.precio_unitario;
+              }
+              lista.appendChild(opcion);
+            });
+          });
+      }, ESPERA_MS);
+    });
+
+    input.addEventListener('change', function() {
+      const opcion = opcionElegida(input);
+      if (input.dataset.destino) {
+        document.getElementById(input.dataset.destino).value = opcion ? opcion.dataset.id : '';
+      }
+      const precio = document.getElementById('precio_unitario');
+      if (opcion && opcion.dataset.precio !== undefined && precio) {
+        precio.value = opcion.dataset.precio;
+      }
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-buscar]').forEach(configurar);
+  });
+})();
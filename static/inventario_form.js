@@ -0,0 +1,22 @@
+function actualizarNombreArtista() {
+  const select = document.getElementById('artista_id');
+  const nombreInput = document.getElementById('nombre_artista');
+  
+  if (select.value) {
+    const textoSeleccionado = select.options[select.selectedIndex].text;
+    // Extrae el nombre sin el país
+    const nombre = textoSeleccionado.split('(')[0].trim();
+    nombreInput.value = nombre;
+  } else {
+    nombreInput.value = '';
+  }
+}
+
+// Al cargar la página, si hay un artista seleccionado, actualizar el nombre
+document.addEventListener('DOMContentLoaded', function() {
+  const select = document.getElementById('artista_id');
+  select.addEventListener('change', actualizarNombreArtista);
+  if (select.value) {
+    actualizarNombreArtista();
+  }
+});
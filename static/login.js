@@ -0,0 +1,22 @@
+// Validación del formulario
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('form[name="loginForm"]');
+    if (form) {
+        form.addEventListener('submit', function(e) {
+            const usuario = document.getElementById('usuario').value.trim();
+            const password = document.getElementById('password').value;
+
+            if (!usuario || usuario.length < 3) {
+                e.preventDefault();
+                alert('⚠️ El usuario debe tener al menos 3 caracteres');
+                return;
+            }
+
+            if (!password || password.length < 6) {
+                e.preventDefault();
+                alert('⚠️ La contraseña debe tener al menos 6 caracteres');
+                return;
+            }
+        });
+    }
+});
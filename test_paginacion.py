@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la paginación por cursor contra mongomock.
+
+Se usa una colección de 7 documentos con valores repetidos en el campo de
+ordenamiento, para que el desempate por _id también quede cubierto.
+"""
+
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, json_util
+
+from paginacion import TAMANO_MAXIMO, TAMANO_PAGINA, codificar_cursor, decodificar_cursor, paginar, tamano_pagina
+
+mongomock = pytest.importorskip("mongomock")
+
+NOMBRES = ["a", "b", "b", "c", "c", "c", "d"]
+
+
+@pytest.fixture
+def coleccion():
+    coleccion = mongomock.MongoClient()["tienda"]["discos"]
+    coleccion.insert_many([{"_id": i, "nombre": nombre} for i, nombre in enumerate(NOMBRES)])
+    return coleccion
+
+
+def _ids(pagina):
+    return [doc["_id"] for doc in pagina["items"]]
+
+
+def test_cursor_ida_y_vuelta():
+    for valor, _id in [("Pink Floyd", ObjectId()), (datetime(2024, 5, 1, 13, 30), "VEN-001"), (None, 7)]:
+        assert decodificar_cursor(codificar_cursor(valor, _id)) == (valor, _id)
+
+
+def test_cursor_invalido():
+    assert decodificar_cursor(None) is None
+    assert decodificar_cursor("") is None
+    assert decodificar_cursor("no-es-un-cursor") is None
+
+
+def _token(valor, _id):
+    """Cursor armado a mano, como lo haría un cliente que altera la URL"""
+    crudo = json_util.dumps([valor, _id]).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("valor, _id", [
+    ({"$regex": "."}, 1),
+    ({"$exists": True}, 1),
+    ({"$bogus": 1}, 1),
+    ("b", {"$gt": 0}),
+    (["a", "b"], 1),
+    ("b", None),
+])
+def test_cursor_alterado_sirve_la_primera_pagina(coleccion, valor, _id):
+    token = _token(valor, _id)
+    assert decodificar_cursor(token) is None
+    for clave in ("despues", "antes"):
+        pagina = paginar(coleccion, "nombre", args={clave: token}, tamano=3)
+        assert _ids(pagina) == [0, 1, 2]
+        assert pagina["anterior"] is None
+
+
+def test_tamano_pagina_acotado():
+    assert tamano_pagina({"tamano": "0"}) == 1
+    assert tamano_pagina({"tamano": "x"}, por_defecto=10) == 10
+    assert tamano_pagina({"tamano": "100000"}) == TAMANO_MAXIMO
+
+
+def test_avanzar_hasta_el_final(coleccion):
+    pagina = paginar(coleccion, "nombre", tamano=3)
+    assert _ids(pagina) == [0, 1, 2]
+    assert pagina["anterior"] is None and pagina["siguiente"]
+
+    pagina = paginar(coleccion, "nombre", args={"despues": pagina["siguiente"]}, tamano=3)
+    assert _ids(pagina) == [3, 4, 5]
+    assert pagina["anterior"] and pagina["siguiente"]
+
+    pagina = paginar(coleccion, "nombre", args={"despues": pagina["siguiente"]}, tamano=3)
+    assert _ids(pagina) == [6]
+    assert pagina["anterior"] and pagina["siguiente"] is None
+
+
+def test_retroceder_hasta_el_principio(coleccion):
+    primera = paginar(coleccion, "nombre", tamano=3)
+    segunda = paginar(coleccion, "nombre", args={"despues": primera["siguiente"]}, tamano=3)
+    ultima = paginar(coleccion, "nombre", args={"despues": segunda["siguiente"]}, tamano=3)
+
+    pagina = paginar(coleccion, "nombre", args={"antes": ultima["anterior"]}, tamano=3)
+    assert _ids(pagina) == [3, 4, 5]
+    assert pagina["anterior"] and pagina["siguiente"]
+
+    pagina = paginar(coleccion, "nombre", args={"antes": pagina["anterior"]}, tamano=3)
+    assert _ids(pagina) == [0, 1, 2]
+    assert pagina["anterior"] is None and pagina["siguiente"]
+
+    # Y desde ahí se puede volver a avanzar
+    pagina = paginar(coleccion, "nombre", args={"despues": pagina["siguiente"]}, tamano=3)
+    assert _ids(pagina) == [3, 4, 5]
+
+
+def test_orden_descendente_con_filtro(coleccion):
+    pagina = paginar(coleccion, "nombre", orden=-1, filtro={"nombre": {"$ne": "d"}}, tamano=4)
+    assert _ids(pagina) == [5, 4, 3, 2]
+    pagina = paginar(coleccion, "nombre", orden=-1, filtro={"nombre": {"$ne": "d"}},
+                     args={"despues": pagina["siguiente"]}, tamano=4)
+    assert _ids(pagina) == [1, 0]
+    assert pagina["siguiente"] is None
+    pagina = paginar(coleccion, "nombre", orden=-1, filtro={"nombre": {"$ne": "d"}},
+                     args={"antes": pagina["anterior"]}, tamano=4)
+    assert _ids(pagina) == [5, 4, 3, 2]
+    assert pagina["anterior"] is None
+
+
+def test_pagina_exacta_sin_siguiente(coleccion):
+    coleccion.delete_one({"_id": 6})
+    primera = paginar(coleccion, "nombre", tamano=3)
+    segunda = paginar(coleccion, "nombre", args={"despues": primera["siguiente"]}, tamano=3)
+    assert _ids(segunda) == [3, 4, 5]
+    assert segunda["siguiente"] is None
+
+
+def test_coleccion_vacia():
+    vacia = mongomock.MongoClient()["tienda"]["vacia"]
+    assert paginar(vacia, "nombre") == {"items": [], "siguiente": None, "anterior": None, "tamano": TAMANO_PAGINA}
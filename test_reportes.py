@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pruebas del filtro de fechas de los reportes contra mongomock.
+
+rango_fechas interpreta la query string y match_ventas arma el $match sobre
+fecha_venta; se prueban juntos para ver qué ventas quedan dentro.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from reportes import match_ventas, rango_fechas
+
+mongomock = pytest.importorskip("mongomock")
+
+FECHAS = [
+    datetime(2024, 5, 30, 23, 59, 59),
+    datetime(2024, 5, 31, 0, 0),
+    datetime(2024, 5, 31, 12, 0),
+    datetime(2024, 5, 31, 23, 59, 59, 999000),
+    datetime(2024, 6, 1, 0, 0),
+]
+
+
+@pytest.fixture
+def ventas():
+    ventas = mongomock.MongoClient()["tienda"]["ventas"]
+    ventas.insert_many([{"_id": i, "fecha_venta": f, "cantidad": 1} for i, f in enumerate(FECHAS)])
+    ventas.insert_one({"_id": 99, "fecha_venta": datetime(2024, 5, 31, 10, 0), "cantidad": 0})
+    return ventas
+
+
+def _filtrar(ventas, args):
+    filtro = match_ventas(*rango_fechas(args))["$match"]
+    return sorted(doc["_id"] for doc in ventas.find(filtro))
+
+
+def test_hasta_solo_fecha_incluye_el_dia_completo(ventas):
+    assert rango_fechas({"hasta": "2024-05-31"}) == (None, datetime(2024, 6, 1))
+    assert _filtrar(ventas, {"desde": "2024-05-31", "hasta": "2024-05-31"}) == [1, 2, 3]
+    assert _filtrar(ventas, {"desde": "20240531", "hasta": "20240531"}) == [1, 2, 3]
+
+
+def test_hasta_con_hora_es_exclusivo(ventas):
+    assert _filtrar(ventas, {"hasta": "2024-05-31T12:00"}) == [0, 1]
+
+
+def test_desde_es_inclusivo(ventas):
+    assert _filtrar(ventas, {"desde": "2024-06-01"}) == [4]
+    assert _filtrar(ventas, {"desde": "2024-05-31T12:00"}) == [2, 3, 4]
+
+
+def test_valores_ausentes_o_invalidos():
+    assert rango_fechas({}) == (None, None)
+    assert rango_fechas({"desde": "  ", "hasta": "31/05/2024"}) == (None, None)
+
+
+def test_sin_rango_excluye_cantidades_no_positivas(ventas):
+    assert _filtrar(ventas, {}) == [0, 1, 2, 3, 4]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pruebas de LimitadorVentana: cambio de ventana y valor de Retry-After.
+
+El reloj se reemplaza con monkeypatch, así que no hace falta esperar.
+"""
+
+import pytest
+import usuarios
+from usuarios import LimitadorVentana
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj controlado: reloj.ahora es el valor de time.monotonic()"""
+    class Reloj:
+        ahora = 0.0
+    monkeypatch.setattr(usuarios.time, "monotonic", lambda: Reloj.ahora)
+    return Reloj
+
+
+def _permitido_en(limitador, reloj, instante, clave="k"):
+    reloj.ahora = instante
+    return limitador.registrar(clave)[0]
+
+
+def test_limite_dentro_de_la_ventana(reloj):
+    limitador = LimitadorVentana(limite=2, ventana=60)
+    assert limitador.registrar("k") == (True, 0)
+    assert limitador.registrar("k") == (True, 0)
+    permitido, espera = limitador.registrar("k")
+    assert not permitido
+    # Otra clave tiene su propio conteo
+    assert limitador.registrar("otra") == (True, 0)
+
+
+def test_retry_after_con_ventana_actual_llena(reloj):
+    limitador = LimitadorVentana(limite=2, ventana=60)
+    limitador.registrar("k")
+    limitador.registrar("k")
+    reloj.ahora = 10
+    permitido, espera = limitador.registrar("k")
+    assert not permitido
+    # Al empezar la ventana siguiente la anterior todavía cuenta completa
+    assert espera == 51
+    assert not _permitido_en(limitador, reloj, 10 + espera - 1)
+    assert _permitido_en(limitador, reloj, 10 + espera)
+
+
+def test_retry_after_con_ventana_anterior_decayendo(reloj):
+    limitador = LimitadorVentana(limite=4, ventana=60)
+    for _ in range(4):
+        limitador.registrar("k")
+    # 10 s dentro de la ventana siguiente: 4 * 50/60 + 0 < 4
+    assert _permitido_en(limitador, reloj, 70)
+    permitido, espera = limitador.registrar("k")
+    assert not permitido
+    # 4 * (1 - t/60) + 1 < 4 recién después de t = 15
+    assert espera == 6
+    assert not _permitido_en(limitador, reloj, 75)
+    assert _permitido_en(limitador, reloj, 70 + espera)
+
+
+def test_ventanas_sin_intentos_no_cuentan(reloj):
+    limitador = LimitadorVentana(limite=2, ventana=60)
+    limitador.registrar("k")
+    limitador.registrar("k")
+    # Dos ventanas después ya no queda nada de la ventana con intentos
+    assert _permitido_en(limitador, reloj, 120)
+    assert _permitido_en(limitador, reloj, 120)
+    assert not _permitido_en(limitador, reloj, 120)
+
+
+def test_limite_por_llamada_y_limpiar(reloj):
+    limitador = LimitadorVentana(limite=1, ventana=60)
+    assert limitador.registrar("ip", limite=3) == (True, 0)
+    assert limitador.registrar("ip", limite=3) == (True, 0)
+    assert limitador.registrar("ip")[0] is False
+    limitador.limpiar("ip")
+    assert limitador.registrar("ip") == (True, 0)
+
+
+def test_memoria_acotada(reloj):
+    limitador = LimitadorVentana(limite=1, ventana=60, maximo=2)
+    for clave in ("a", "b", "c"):
+        limitador.registrar(clave)
+    # "a" fue desalojada: vuelve a tener su intento
+    assert limitador.registrar("a") == (True, 0)
+    assert limitador.registrar("c")[0] is False
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Usuarios y roles en MongoDB, con contraseñas cifradas.
+
+Cada usuario es un documento de `usuarios` ({_id: usuario, nombre, rol,
+password_hash, activo}) y cada rol uno de `roles` ({_id: rol, permisos,
+descripcion}). Las contraseñas se guardan con generate_password_hash de
+Werkzeug (scrypt con sal aleatoria).
+
+La verificación del hash es lenta a propósito, así que corre en un pool de
+hilos acotado (LOGIN_WORKERS) y con una cola limitada (LOGIN_COLA): si el
+pool está lleno el login responde "ocupado" en lugar de acumular requests.
+Una verificación correcta se recuerda LOGIN_CACHE_TTL segundos (clave HMAC
+con una clave aleatoria del proceso; nunca se guarda la contraseña), y
+cambiar la contraseña invalida la entrada porque el hash forma parte de la
+clave.
+
+Los intentos de login pasan antes por LimitadorVentana, por IP y por usuario,
+para que nadie pueda llenar el pool probando contraseñas.
+
+Uso:
+    python usuarios.py demo                          # roles y usuarios de demostración
+    python usuarios.py crear jperez operativo --nombre "Juan Pérez"
+"""
+
+import argparse
+import getpass
+import hashlib
+import hmac
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+from dotenv import load_dotenv
+from werkzeug.security import check_password_hash, generate_password_hash
+from cache import CacheLRU
+from conexion import base_datos, crear_cliente
+from models import ROLES, USUARIOS
+
+COLECCION_USUARIOS = "usuarios"
+COLECCION_ROLES = "roles"
+
+WORKERS = int(os.getenv("LOGIN_WORKERS", "2"))
+COLA = int(os.getenv("LOGIN_COLA", "16"))
+ESPERA_MAXIMA = float(os.getenv("LOGIN_TIMEOUT", "5"))
+LIMITE_INTENTOS = int(os.getenv("LOGIN_LIMITE", "5"))
+# Por IP el límite es mayor: varios usuarios pueden compartir una IP (NAT)
+LIMITE_INTENTOS_IP = int(os.getenv("LOGIN_LIMITE_IP", "20"))
+VENTANA = float(os.getenv("LOGIN_VENTANA", "60"))
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="login")
+# Verificaciones en curso o en cola (no se espera a que se libere un cupo)
+_cupos = threading.BoundedSemaphore(WORKERS + COLA)
+_clave_proceso = os.urandom(32)
+_verificados = CacheLRU(
+    maximo=1024, ttl=int(os.getenv("LOGIN_CACHE_TTL", "300")), nombre="login"
+)
+
+
+class LoginOcupado(Exception):
+    """El pool de verificación está lleno"""
+
+
+class LimitadorVentana:
+    """
+    Límite de intentos por clave con ventana deslizante aproximada.
+
+    Por clave se guardan solo dos contadores (ventana fija actual y anterior);
+    el conteo deslizante es anterior * (parte de la ventana anterior que
+    sigue dentro) + actual. Las claves más antiguas se desalojan al superar
+    `maximo`, así que la memoria también está acotada en total.
+    """
+
+    def __init__(self, limite=LIMITE_INTENTOS, ventana=VENTANA, maximo=100_000):
+        self.limite = limite
+        self.ventana = ventana
+        self.maximo = maximo
+        self._datos = OrderedDict()  # clave -> [número de ventana, actual, anterior]
+        self._lock = threading.Lock()
+
+    def registrar(self, clave, limite=None):
+        """
+        Cuenta un intento si está dentro del límite (el del limitador, o `limite`).
+
+        Returns:
+            tuple: (permitido, segundos de espera si no lo está)
+        """
+        limite = limite or self.limite
+        ahora = time.monotonic()
+        numero, transcurrido = divmod(ahora, self.ventana)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                entrada = self._datos[clave] = [numero, 0, 0]
+            elif entrada[0] != numero:
+                entrada[2] = entrada[1] if entrada[0] == numero - 1 else 0
+                entrada[0], entrada[1] = numero, 0
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+            _, actual, anterior = entrada
+            peso = 1 - transcurrido / self.ventana
+            if anterior * peso + actual < limite:
+                entrada[1] += 1
+                return True, 0
+        return False, self._espera(limite, actual, anterior, transcurrido)
+
+    def _espera(self, limite, actual, anterior, transcurrido):
+        """Segundos enteros tras los cuales el siguiente intento será permitido"""
+        if actual < limite and anterior:
+            # Momento en que la parte de la ventana anterior deja lugar a un intento
+            espera = self.ventana * (1 - (limite - actual) / anterior) - transcurrido
+        else:
+            # La ventana actual pasa a ser la anterior y también tiene que decaer
+            espera = self.ventana - transcurrido + self.ventana * (1 - limite / actual)
+        # El conteo tiene que quedar estrictamente por debajo del límite
+        return math.floor(espera) + 1
+
+    def limpiar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+
+def cifrar(password):
+    return generate_password_hash(password)
+
+
+@lru_cache(maxsize=1)
+def _hash_ficticio():
+    # Un usuario inexistente tarda lo mismo que una contraseña incorrecta
+    return cifrar(os.urandom(16).hex())
+
+
+def _huella(usuario, password, password_hash):
+    mensaje = "\0".join((usuario, password, password_hash)).encode()
+    return hmac.new(_clave_proceso, mensaje, hashlib.sha256).hexdigest()
+
+
+def verificar_password(usuario, password, password_hash):
+    """
+    Compara la contraseña con su hash en el pool de login.
+
+    Raises:
+        LoginOcupado: si el pool y su cola están llenos
+    """
+    huella = _huella(usuario, password, password_hash)
+    if _verificados.obtener(huella):
+        return True
+    if not _cupos.acquire(blocking=False):
+        raise LoginOcupado("Demasiados inicios de sesión en curso, intenta de nuevo")
+    futuro = _pool.submit(check_password_hash, password_hash, password)
+    # El cupo se libera cuando termina el hash, aunque el request deje de esperar
+    futuro.add_done_callback(lambda _: _cupos.release())
+    try:
+        valido = futuro.result(timeout=ESPERA_MAXIMA)
+    except TimeoutError:
+        raise LoginOcupado("La verificación tardó demasiado, intenta de nuevo")
+    if valido:
+        _verificados.guardar(huella, True)
+    return valido
+
+
+def autenticar(db, usuario, password):
+    """
+    Valida credenciales contra la colección de usuarios.
+
+    Returns:
+        dict: nombre, rol y permisos del usuario, o None si no son válidas
+    """
+    doc = db[COLECCION_USUARIOS].find_one({"_id": usuario, "activo": {"$ne": False}})
+    password_hash = doc.get("password_hash") if doc else None
+    valido = verificar_password(usuario, password, password_hash or _hash_ficticio())
+    if not (valido and password_hash):
+        return None
+    rol = db[COLECCION_ROLES].find_one({"_id": doc.get("rol")})
+    return {
+        "nombre": doc.get("nombre", usuario),
+        "rol": doc.get("rol", ""),
+        "permisos": sorted((rol or {}).get("permisos", [])),
+    }
+
+
+def permisos_rol(db, rol):
+    """Permisos de un rol (sesiones creadas antes de guardar los permisos)"""
+    doc = db[COLECCION_ROLES].find_one({"_id": rol}, {"permisos": 1}) if rol else None
+    return sorted((doc or {}).get("permisos", []))
+
+
+def crear_usuario(db, usuario, password, rol, nombre=None):
+    """Crea o reemplaza un usuario con su contraseña cifrada"""
+    if db[COLECCION_ROLES].count_documents({"_id": rol}, limit=1) == 0:
+        raise ValueError(f"Rol desconocido: {rol}")
+    db[COLECCION_USUARIOS].update_one(
+        {"_id": usuario},
+        {"$set": {"nombre": nombre or usuario, "rol": rol,
+                  "password_hash": cifrar(password), "activo": True}},
+        upsert=True,
+    )
+
+
+def sembrar(db, demo=False):
+    """
+    Crea los roles de models.ROLES que falten y, con demo=True y sin ningún
+    usuario, los usuarios de demostración de models.USUARIOS.
+
+    Returns:
+        int: usuarios creados
+    """
+    for rol, definicion in ROLES.items():
+        db[COLECCION_ROLES].update_one({"_id": rol}, {"$setOnInsert": definicion}, upsert=True)
+    if not demo or db[COLECCION_USUARIOS].count_documents({}, limit=1):
+        return 0
+    for usuario, datos in USUARIOS.items():
+        crear_usuario(db, usuario, datos["password"], datos["rol"], datos["nombre"])
+    return len(USUARIOS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administra los usuarios de la tienda")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("demo", help="crea roles y usuarios de demostración si no hay usuarios")
+    crear = comandos.add_parser("crear", help="crea un usuario (pide la contraseña)")
+    crear.add_argument("usuario")
+    crear.add_argument("rol", choices=sorted(ROLES))
+    crear.add_argument("--nombre")
+    opciones = parser.parse_args()
+
+    load_dotenv()
+    db = base_datos(crear_cliente())
+
+    if opciones.comando == "demo":
+        print(f"✓ {sembrar(db, demo=True)} usuarios de demostración creados")
+        return 0
+
+    sembrar(db)
+    password = getpass.getpass("Contraseña: ")
+    if len(password) < 6:
+        print("❌ La contraseña debe tener al menos 6 caracteres")
+        return 1
+    crear_usuario(db, opciones.usuario, password, opciones.rol, opciones.nombre)
+    print(f"✓ Usuario {opciones.usuario} ({opciones.rol}) guardado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())